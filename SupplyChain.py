@@ -1,13 +1,24 @@
 import abc
+import collections
+import contextlib
+import copyreg
+import csv
 import enum
+import gc
+import hashlib
+import heapq
+import json
+import math
+import operator
+import os
+import pickle
+import sqlite3
 import string
+import threading
+import time
 
-import pandas as pd
-import openpyxl
 from datetime import date
 
-from numpy.core.defchararray import upper
-
 
 class Holiday(enum.Enum):
     """
@@ -50,6 +61,7 @@ class Toys(abc.ABC):
     Toys defines the interface for one of the products that the
     abstract factory is responsible to create
     """
+    __slots__ = ('name', 'description', 'product_id', 'has_batteries', 'min_age')
 
     @abc.abstractmethod
     def __init__(self, name, description, product_id, has_batteries, min_age):
@@ -64,6 +76,7 @@ class SantaSWorkshop(Toys):
     """
     Santa's Workshop is a Christmas-themed Toy
     """
+    __slots__ = ('dimensions', 'num_rooms')
 
     def __init__(self, name, description, product_id, has_batteries, min_age, dimensions, num_rooms):
         super().__init__(name, description, product_id, has_batteries, min_age)
@@ -75,6 +88,7 @@ class RCSpider(Toys):
     """
     RC (Remote Controlled) Spider is a Halloween-themed Toy
     """
+    __slots__ = ('speed', 'jump_height', 'has_glow', 'spider_type')
 
     def __init__(self, name, description, product_id, has_batteries, min_age, speed, jump_height, has_glow,
                  spider_type):
@@ -89,6 +103,7 @@ class RobotBunny(Toys):
     """
     Robot Bunny is an Easter-themed Toy
     """
+    __slots__ = ('num_sound', 'colour')
 
     def __init__(self, name, description, product_id, has_batteries, min_age, num_sound, colour
                  ):
@@ -102,6 +117,7 @@ class StuffedAnimals(abc.ABC):
     Stuffed Animals defines the interface for one of the products that the
     abstract factory pattern is responsible to create.
     """
+    __slots__ = ('name', 'description', 'product_id', 'stuffing', 'size', 'fabric')
 
     @abc.abstractmethod
     def __init__(self, name, description, product_id, stuffing, size, fabric):
@@ -117,6 +133,7 @@ class DancingSkeleton(StuffedAnimals):
     """
     Dancing Skeleton is a Halloween-themed Stuffed Animal
     """
+    __slots__ = ('has_glow',)
 
     def __init__(self, name, description, product_id, stuffing, size, fabric, has_glow):
         super().__init__(name, description, product_id, stuffing, size, fabric)
@@ -127,6 +144,7 @@ class Reindeer(StuffedAnimals):
     """
     Reindeer is a Christmas-themed Stuffed Animal
     """
+    __slots__ = ('has_glow',)
 
     def __init__(self, name, description, product_id, stuffing, size, fabric, has_glow):
         super().__init__(name, description, product_id, stuffing, size, fabric)
@@ -137,6 +155,7 @@ class EasterBunny(StuffedAnimals):
     """
     Easter Bunny is an Easter-themed Stuffed Animal
     """
+    __slots__ = ('colour',)
 
     def __init__(self, name, description, product_id, stuffing, size, fabric, colour):
         super().__init__(name, description, product_id, stuffing, size, fabric)
@@ -148,6 +167,7 @@ class Candy(abc.ABC):
     Candy defines the interface for one of the products that the
     abstract factory pattern is responsible to create.
     """
+    __slots__ = ('name', 'description', 'product_id', 'has_nuts', 'has_lactose')
 
     @abc.abstractmethod
     def __init__(self, name, description, product_id, has_nuts, has_lactose):
@@ -162,6 +182,7 @@ class PumpkinCaramelToffee(Candy):
     """
     CremeEggs is a Halloween-themed Candy
     """
+    __slots__ = ('variety',)
 
     def __init__(self, name, description, product_id, has_nuts, has_lactose, variety):
         super().__init__(name, description, product_id, has_nuts, has_lactose)
@@ -172,6 +193,7 @@ class CandyCanes(Candy):
     """
     CremeEggs is a Christmas-themed Candy
     """
+    __slots__ = ('colour',)
 
     def __init__(self, name, description, product_id, has_nuts, has_lactose, colour):
         super().__init__(name, description, product_id, has_nuts, has_lactose)
@@ -182,18 +204,186 @@ class CremeEggs(Candy):
     """
     CremeEggs is an Easter-themed Candy
     """
+    __slots__ = ('pack_size',)
 
     def __init__(self, name, description, product_id, has_nuts, has_lactose, pack_size):
         super().__init__(name, description, product_id, has_nuts, has_lactose)
         self.pack_size = pack_size
 
 
+def _enumValue(member):
+    """
+    returns the string value of an enum member, unwrapping the one element tuples
+    that some members hold.
+    :param member: an Enum member
+    :return: a String
+    """
+    return member.value[0] if isinstance(member.value, tuple) else member.value
+
+
+def _choices(*members):
+    """
+    precomputes the lowercase spellings accepted for a set of enum members,
+    e.g. "sea_salt" and "sea salt" for CandyFlavour.SEA_SALT.
+    :param members: Enum members
+    :return: a frozenset of Strings
+    """
+    accepted = set()
+    for member in members:
+        accepted.add(member.name.lower())
+        accepted.add(member.name.lower().replace("_", " "))
+        accepted.add(_enumValue(member).lower())
+    return frozenset(accepted)
+
+
+class ProductPool:
+    """
+    Flyweight pool of products keyed by product_id. Products are immutable once built,
+    so every order for the same SKU can share a single instance.
+    """
+
+    def __init__(self):
+        self.products = {}
+
+    def intern(self, spec, values):
+        """
+        returns the pooled product for the product_id in values if it was built by the same
+        spec with the same field values, otherwise builds it and replaces the pooled entry.
+        :param spec: a ProductSpec
+        :param values: a tuple of field values in spec.fields order
+        :return: a product
+        """
+        product = self.products.get(values[PRODUCT_ID_POSITION])
+        if product is not None and type(product) is spec.product_class:
+            for field, value in zip(spec.fields, values):
+                if getattr(product, field) != value:
+                    break
+            else:
+                return product
+        product = spec.createValues(values)
+        self.products[product.product_id] = product
+        return product
+
+    def clear(self):
+        self.products.clear()
+
+    def __len__(self):
+        return len(self.products)
+
+
+PRODUCT_POOL = ProductPool()
+
+PRODUCT_FIELDS = ('name', 'description', 'product_id')
+PRODUCT_ID_POSITION = PRODUCT_FIELDS.index('product_id')
+
+TOY_FIELDS = PRODUCT_FIELDS + ('has_batteries', 'min_age')
+STUFFED_ANIMAL_FIELDS = PRODUCT_FIELDS + ('stuffing', 'size', 'fabric')
+CANDY_FIELDS = PRODUCT_FIELDS + ('has_nuts', 'has_lactose')
+
+
+class ProductSpec:
+    """
+    Declarative description of how a factory builds one product: the class to construct,
+    the fields passed to it in order, and the accepted values for enum backed fields.
+    Every spec also defines the typed record an Order keeps its product details in,
+    holding only the fields after the common name, description and product_id.
+    """
+
+    def __init__(self, product_class, fields, choices=None, pool=PRODUCT_POOL):
+        """
+        initializer for a product spec.
+        :param product_class: the product class to construct
+        :param fields: a tuple of field names, in constructor order
+        :param choices: a dict of field name to a frozenset of accepted lowercase values
+        :param pool: the ProductPool products are interned in, None to always build new products
+        """
+        self.product_class = product_class
+        self.fields = fields
+        self.choices = choices or {}
+        self.pool = pool
+        self.choicePositions = [(fields.index(field), field, accepted) for field, accepted in self.choices.items()]
+        self.details = collections.namedtuple(f"{product_class.__name__}Details", fields[len(PRODUCT_FIELDS):],
+                                              module=__name__)
+        # the generated type is not reachable by name, so pickle rebuilds its records through the spec
+        copyreg.pickle(self.details, self.reduceDetails)
+
+    def reduceDetails(self, details):
+        """
+        tells pickle how to rebuild a details record, e.g. in an Order sent to a worker process.
+        :param details: a record of this spec's details type
+        :return: a tuple of (function, arguments), as for object.__reduce__
+        """
+        return _makeDetails, (self.product_class, tuple(details))
+
+    def values(self, fields):
+        """
+        :param fields: a dict of field names to values. Extra fields are ignored.
+        :return: a tuple of field values in constructor order
+        """
+        try:
+            return tuple([fields[field] for field in self.fields])
+        except KeyError as e:
+            raise ValueError(f"{self.product_class.__name__} is missing field {e.args[0]}") from None
+
+    def orderValues(self, order):
+        """
+        :param order: an Order whose details record was made by this spec
+        :return: a tuple of field values in constructor order
+        """
+        details = order.getDetails()
+        if type(details) is not self.details:
+            raise ValueError(f"order {order.getOrderNumber()} has no {self.product_class.__name__} details")
+        return (order.getItemName(), order.getDescription(), order.getProductID()) + details
+
+    def build(self, fields):
+        """
+        returns the product described by a mapping of field names to values, reusing the
+        pooled instance for that product_id when it is identical. Extra fields are ignored.
+        :param fields: a dict
+        :return: a product
+        """
+        return self.buildValues(self.values(fields))
+
+    def buildValues(self, values):
+        """
+        :param values: a tuple of field values in constructor order
+        :return: the pooled product for these values, see build
+        """
+        if self.pool is None:
+            return self.createValues(values)
+        return self.pool.intern(self, values)
+
+    def create(self, fields):
+        """
+        builds a new product from a mapping of field names to values. Extra fields are ignored.
+        :param fields: a dict
+        :return: a product
+        """
+        return self.createValues(self.values(fields))
+
+    def createValues(self, values):
+        """
+        builds a new product, checking enum backed fields.
+        :param values: a tuple of field values in constructor order
+        :return: a product
+        """
+        for position, field, accepted in self.choicePositions:
+            value = values[position]
+            if not isinstance(value, str) or value.lower() not in accepted:
+                raise ValueError(f"invalid {field} for {self.product_class.__name__}: {value}")
+        return self.product_class(*values)
+
+
 class HolidayFactory(abc.ABC):
     """
     The base factory class. All worlds expect this factory class to
     populate the world. The CharacterFactory class defines an interface
     to create the a Product family consisting of Toys, Stuffed Animals or Candy. These vary by Holiday.
+    Each concrete factory declares a ProductSpec per product it creates.
     """
+    toy_spec = None
+    stuffed_animal_spec = None
+    candy_spec = None
 
     @abc.abstractmethod
     def create_toys(self, **kwargs) -> Toys:
@@ -207,6 +397,27 @@ class HolidayFactory(abc.ABC):
     def create_candy(self, **kwargs) -> Candy:
         pass
 
+    def get_spec(self, product: Product) -> ProductSpec:
+        """
+        :param product: a ProductEnum
+        :return: the ProductSpec this factory uses for that product
+        """
+        return {
+            Product.TOY: self.toy_spec,
+            Product.STUFFED_ANIMAL: self.stuffed_animal_spec,
+            Product.CANDY: self.candy_spec
+        }[product]
+
+    def create_many(self, product: Product, rows) -> list:
+        """
+        builds one product per row mapping in a single call.
+        :param product: a ProductEnum
+        :param rows: an iterable of dicts of field names to values
+        :return: a list of products
+        """
+        build = self.get_spec(product).build
+        return [build(row) for row in rows]
+
 
 class HalloweenFactory(HolidayFactory):
     """
@@ -214,74 +425,28 @@ class HalloweenFactory(HolidayFactory):
     returns a product family consisting of RC Spider, Stuffed Animals, and
     Pumpkin Caramel Toffee.
     """
+    toy_spec = ProductSpec(RCSpider, TOY_FIELDS + ('speed', 'jump_height', 'has_glow', 'spider_type'))
+    stuffed_animal_spec = ProductSpec(DancingSkeleton, STUFFED_ANIMAL_FIELDS + ('has_glow',))
+    candy_spec = ProductSpec(PumpkinCaramelToffee, CANDY_FIELDS + ('variety',),
+                             {'variety': _choices(CandyFlavour.REGULAR, CandyFlavour.SEA_SALT)})
 
     def create_toys(self, **kwargs) -> Toys:
         """
         :return: returns a RC Spider
         """
-        spider_type = ""
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_batteries":
-                has_batteries = item
-            if key == "min_age":
-                min_age = item
-            if key == "speed":
-                speed = item
-            if key == "jump_height":
-                jump_height = item
-            if key == "has_glow":
-                has_glow = item
-            if key == "spider_type":
-                spider_type = item
-        return RCSpider(name, description, product_id, has_batteries, min_age, speed, jump_height, has_glow,
-                        spider_type)
+        return self.toy_spec.build(kwargs)
 
     def create_stuffed_animals(self, **kwargs) -> StuffedAnimals:
         """
         :return: Returns a Dancing Skeleton
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "stuffing":
-                stuffing = item
-            if key == "size":
-                size = item
-            if key == "fabric":
-                fabric = item
-            if key == "has_glow":
-                has_glow = item
-        return DancingSkeleton(name, description, product_id, stuffing, size, fabric, has_glow)
+        return self.stuffed_animal_spec.build(kwargs)
 
     def create_candy(self, **kwargs) -> Candy:
         """
         :return: Returns a Pumpkin Caramel Toffee
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_nuts":
-                has_nuts = item
-            if key == "has_lactose":
-                has_lactose = item
-            if key == "variety":
-                if item.lower() == CandyFlavour.REGULAR.name.lower() or item.lower() == CandyFlavour.SEA_SALT.name.lower():
-                    variety = item
-        return PumpkinCaramelToffee(name, description, product_id, has_nuts, has_lactose, variety)
+        return self.candy_spec.build(kwargs)
 
 
 class ChristmasFactory(HolidayFactory):
@@ -290,68 +455,28 @@ class ChristmasFactory(HolidayFactory):
     returns a product family consisting of Santa's Workshop, Reindeer, and
     Candy Cane.
     """
+    toy_spec = ProductSpec(SantaSWorkshop, TOY_FIELDS + ('dimensions', 'num_rooms'))
+    stuffed_animal_spec = ProductSpec(Reindeer, STUFFED_ANIMAL_FIELDS + ('has_glow',))
+    candy_spec = ProductSpec(CandyCanes, CANDY_FIELDS + ('colour',),
+                             {'colour': _choices(Colour.RED, Colour.GREEN)})
 
     def create_toys(self, **kwargs) -> Toys:
         """
         :return: returns a Santa's Workshop
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_batteries":
-                has_batteries = item
-            if key == "min_age":
-                min_age = item
-            if key == "dimension":
-                dimension = item
-            if key == "num_rooms":
-                num_rooms = item
-        return SantaSWorkshop(name, description, product_id, has_batteries, min_age, dimension, num_rooms)
+        return self.toy_spec.build(kwargs)
 
     def create_stuffed_animals(self, **kwargs) -> StuffedAnimals:
         """
         :return: Returns a Reindeer
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "stuffing":
-                stuffing = item
-            if key == "size":
-                size = item
-            if key == "fabric":
-                fabric = item
-            if key == "has_glow":
-                has_glow = item
-        return Reindeer(name, description, product_id, stuffing, size, fabric, has_glow)
+        return self.stuffed_animal_spec.build(kwargs)
 
     def create_candy(self, **kwargs) -> Candy:
         """
         :return: Returns a Candy Canes
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_nuts":
-                has_nuts = item
-            if key == "has_lactose":
-                has_lactose = item
-            if key == "colour":
-                if item.lower() == Colour.RED.name.lower() or item.lower() == Colour.GREEN.name.lower():
-                    colour = item
-        return CandyCanes(name, description, product_id, has_nuts, has_lactose, colour)
+        return self.candy_spec.build(kwargs)
 
 
 class EasterFactory(HolidayFactory):
@@ -360,78 +485,35 @@ class EasterFactory(HolidayFactory):
     returns a product family consisting of Robot Bunny, Easter Bunny, and
     Creme Eggs.
     """
+    toy_spec = ProductSpec(RobotBunny, TOY_FIELDS + ('num_sound', 'colour'),
+                           {'colour': _choices(Colour.ORANGE, Colour.BLUE, Colour.PINK)})
+    stuffed_animal_spec = ProductSpec(EasterBunny, STUFFED_ANIMAL_FIELDS + ('colour',),
+                                      {'colour': _choices(Colour.WHITE, Colour.GREY, Colour.PINK, Colour.BLUE)})
+    candy_spec = ProductSpec(CremeEggs, CANDY_FIELDS + ('pack_size',))
 
     def create_toys(self, **kwargs) -> Toys:
         """
         :return: returns a Robot Bunny
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_batteries":
-                has_batteries = item
-            if key == "min_age":
-                min_age = item
-            if key == "num_sound":
-                num_sound = item
-            if key == "colour":
-                colour = item
-                if item.lower() == Colour.ORANGE.name.lower() or item.lower() == Colour.BLUE.name.lower() or \
-                        item.lower() == Colour.PINK.name.lower():
-                    colour = item
-        return RobotBunny(name, description, product_id, has_batteries, min_age, num_sound,
-                          colour)
+        return self.toy_spec.build(kwargs)
 
     def create_stuffed_animals(self, **kwargs) -> StuffedAnimals:
         """
         :return: Returns an Easter Bunny
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "stuffing":
-                stuffing = item
-            if key == "size":
-                size = item
-            if key == "fabric":
-                fabric = item
-            if key == "colour":
-                if item.lower() == Colour.WHITE.name.lower() or item.lower() == Colour.GREY.name.lower() or \
-                        item.lower() == Colour.PINK.name.lower() or item.lower() == Colour.BLUE.name.lower():
-                    colour = item
-        return EasterBunny(name, description, product_id, stuffing, size, fabric, colour)
+        return self.stuffed_animal_spec.build(kwargs)
 
     def create_candy(self, **kwargs) -> Candy:
         """
         :return: Returns a Creme Eggs
         """
-        for key, item in kwargs.items():
-            if key == "name":
-                name = item
-            if key == "description":
-                description = item
-            if key == "product_id":
-                product_id = item
-            if key == "has_nuts":
-                has_nuts = item
-            if key == "has_lactose":
-                has_lactose = item
-            if key == "pack_size":
-                pack_size = item
-        return CremeEggs(name, description, product_id, has_nuts, has_lactose, pack_size)
+        return self.candy_spec.build(kwargs)
 
 
 class HolidayMapper:
     """
-    class that maps different enums to different factories.
+    class that maps different enums to different factories. Factories are stateless,
+    so one shared instance per holiday is created up front and reused for every order.
     """
     holiday_mapper = {
         Holiday.HALLOWEEN: HalloweenFactory,
@@ -439,14 +521,502 @@ class HolidayMapper:
         Holiday.EASTER: EasterFactory
     }
 
+    factories = {holiday: factory_class() for holiday, factory_class in holiday_mapper.items()}
+
+    holiday_lookup = {holiday.name.lower(): holiday for holiday in Holiday}
+
+    product_lookup = {_enumValue(product).lower(): product for product in Product}
+
     def get_factory(self, holiday_type: Holiday) -> HolidayFactory:
         """
         Retrieves the associated factory for the specified HolidayEnum
         :param holiday_type: holidayEnum
         :return: a holidayFactory if found, None otherwise
         """
-        factory_class = self.holiday_mapper.get(holiday_type)
-        return factory_class()
+        return self.factories.get(holiday_type)
+
+    def get_holiday(self, holiday_name) -> Holiday:
+        """
+        Maps a holiday name from an order sheet to its HolidayEnum, ignoring case
+        :param holiday_name: a String
+        :return: a holidayEnum if found, None otherwise
+        """
+        if not isinstance(holiday_name, str):
+            return None
+        return self.holiday_lookup.get(holiday_name.strip().lower())
+
+    def build_product(self, order):
+        """
+        Builds the product an order is for with the factory for the order's holiday
+        :param order: an Order
+        :return: a tuple of (productEnum, product), (None, None) if the holiday or item is unknown
+        """
+        holiday, item = order.get_factoryMapping()
+        product = self.get_product(item)
+        factory = self.get_factory(self.get_holiday(holiday))
+        if product is None or factory is None:
+            return None, None
+        spec = factory.get_spec(product)
+        return product, spec.buildValues(spec.orderValues(order))
+
+    def get_details(self, holiday_name, product_name):
+        """
+        Finds the record type an order for this holiday and item keeps its product details in
+        :param holiday_name: a String
+        :param product_name: a String
+        :return: a ProductSpec details type, None if the holiday or item is unknown
+        """
+        product = self.get_product(product_name)
+        factory = self.get_factory(self.get_holiday(holiday_name))
+        if product is None or factory is None:
+            return None
+        return factory.get_spec(product).details
+
+    def get_product(self, product_name) -> Product:
+        """
+        Maps an item name from an order sheet, e.g. "StuffedAnimal", to its ProductEnum, ignoring case
+        :param product_name: a String
+        :return: a productEnum if found, None otherwise
+        """
+        if not isinstance(product_name, str):
+            return None
+        return self.product_lookup.get(product_name.strip().lower())
+
+
+class Thresholds:
+    """
+    A setting that can be overridden per Holiday and per SKU. A lookup tries the
+    product_id first, then the product's holiday, then falls back to the default.
+    """
+
+    def __init__(self, default, byHoliday=None, byProduct=None):
+        """
+        initializer for the thresholds.
+        :param default: the value used when there is no override
+        :param byHoliday: a dict of HolidayEnum to value
+        :param byProduct: a dict of product_id to value
+        """
+        self.default = default
+        self.byHoliday = byHoliday or {}
+        self.byProduct = byProduct or {}
+
+    def get(self, product_id=None, holiday=None):
+        """
+        :param product_id: a String
+        :param holiday: a HolidayEnum
+        :return: the value for the product
+        """
+        value = self.byProduct.get(product_id)
+        if value is None:
+            value = self.byHoliday.get(holiday, self.default)
+        return value
+
+    @classmethod
+    def fromConfig(cls, config, convert=None):
+        """
+        reads thresholds from configuration, either a plain value or a dict such as
+        {"default": 100, "holiday": {"Christmas": 250}, "product": {"C0001T": 500}}.
+        A dict must give its "default", which may be null for settings that allow None.
+        :param config: a value or a dict
+        :param convert: a function applied to every value, e.g. tuple
+        :return: a Thresholds
+        """
+        if isinstance(config, Thresholds):
+            return config
+        convert = convert or (lambda value: value)
+        if not isinstance(config, dict):
+            return cls(convert(config))
+        if "default" not in config:
+            raise ValueError(f"thresholds {config!r} have no \"default\" value")
+        holiday_mapper = HolidayMapper()
+        by_holiday = {}
+        for name, value in config.get("holiday", {}).items():
+            holiday = holiday_mapper.get_holiday(name)
+            if holiday is None:
+                raise ValueError(f"unknown holiday {name!r}")
+            by_holiday[holiday] = convert(value)
+        by_product = {product_id: convert(value) for product_id, value in config.get("product", {}).items()}
+        default = config["default"]
+        return cls(None if default is None else convert(default), by_holiday, by_product)
+
+
+DEFAULT_STOCK_LEVELS = (10, 3)
+
+
+class StockLevel(enum.Enum):
+    """
+    This enum specifies how well stocked a product is.
+    """
+    IN_STOCK = "item is in stock"
+    LOW = "item is low in stock"
+    VERY_LOW = "item is very low in stock"
+    OUT_OF_STOCK = "item is out stock"
+
+    @classmethod
+    def fromCount(cls, count, levels=DEFAULT_STOCK_LEVELS):
+        """
+        :param count: an int, units on hand
+        :param levels: a tuple of (in stock from, low above) unit counts
+        :return: a StockLevel
+        """
+        in_stock, low = levels
+        if count >= in_stock:
+            return cls.IN_STOCK
+        if count > low:
+            return cls.LOW
+        if count > 0:
+            return cls.VERY_LOW
+        return cls.OUT_OF_STOCK
+
+
+class StockCheck:
+    """
+    The result of looking up a product_id in the inventory.
+    """
+
+    def __init__(self, product_id, count, category, levels=DEFAULT_STOCK_LEVELS):
+        """
+        initializer for a stock check.
+        :param product_id: a String
+        :param count: an int
+        :param category: a ProductEnum, None if the product has never been stocked
+        :param levels: the product's stock level thresholds, see StockLevel.fromCount
+        """
+        self.product_id = product_id
+        self.count = count
+        self.category = category
+        self.status = StockLevel.fromCount(count, levels)
+
+    def __str__(self):
+        return f"your search returned {self.count} result\n{self.status.value}"
+
+
+@contextlib.contextmanager
+def _gcDisabled():
+    """
+    pauses the cyclic garbage collector while a block builds a great many small objects,
+    which would otherwise trigger collections over and over though none of them form cycles.
+    :return: a context manager
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _deductQuantity(quantity):
+    """
+    :param quantity: a number of units to deduct
+    :return: the quantity as an int
+    :raises ValueError: if the quantity is negative, which would add stock
+    """
+    quantity = int(quantity)
+    if quantity < 0:
+        raise ValueError(f"cannot deduct a negative quantity: {quantity}")
+    return quantity
+
+
+class StockRecord:
+    """
+    A single product held in stock along with its on-hand count.
+    """
+
+    def __init__(self, product, count=0, category=None):
+        """
+        initializer for a stock record.
+        :param product: a Toys, StuffedAnimals or Candy
+        :param count: an int
+        :param category: a ProductEnum
+        """
+        self.product = product
+        self.count = count
+        self.category = category
+
+
+class StockLedger:
+    """
+    Stock ledger keyed by product_id. Holds one product record and an on-hand
+    count per SKU rather than one entry per physical unit.
+    """
+
+    def __init__(self, items=(), category=None, index=None):
+        """
+        initializer for the stock ledger.
+        :param items: an iterable of products, one entry per unit
+        :param category: a ProductEnum, the kind of product this ledger stocks
+        :param index: a dict of product_id to StockRecord shared across ledgers, kept up to date on add
+        """
+        self.records = {}
+        self.nameCounts = {}
+        # name -> product_ids stocked under it, in the order they were first stocked
+        self.nameIds = {}
+        self.category = category
+        self.index = index if index is not None else {}
+        for item in items:
+            self.add(item, 1)
+
+    def add(self, item, quantity):
+        """
+        adds units of a product to the ledger.
+        :param item: a product
+        :param quantity: an int
+        :return: None
+        """
+        quantity = int(quantity)
+        record = self.records.get(item.product_id)
+        if record is None:
+            record = StockRecord(item, 0, self.category)
+            self.records[item.product_id] = record
+            self.index[item.product_id] = record
+            self.nameIds.setdefault(item.name, {})[item.product_id] = None
+        record.count += quantity
+        # a product_id keeps the product it was first stocked as, so count under that name
+        name = record.product.name
+        self.nameCounts[name] = self.nameCounts.get(name, 0) + quantity
+
+    def load(self, products, counts):
+        """
+        bulk loads products that are not yet in the ledger, e.g. from a snapshot.
+        :param products: a list of products
+        :param counts: a list of ints, on-hand count per product
+        :return: None
+        """
+        records = self.records
+        index = self.index
+        nameCounts = self.nameCounts
+        nameIds = self.nameIds
+        category = self.category
+        for product, count in zip(products, counts):
+            record = StockRecord(product, count, category)
+            records[product.product_id] = record
+            index[product.product_id] = record
+            nameCounts[product.name] = nameCounts.get(product.name, 0) + count
+            nameIds.setdefault(product.name, {})[product.product_id] = None
+
+    def remove(self, item, quantity):
+        """
+        removes up to quantity units of a product from the ledger.
+        :param item: a product
+        :param quantity: an int
+        :return: the number of units removed
+        """
+        return self.deduct(item.product_id, quantity)
+
+    def deduct(self, product_id, quantity):
+        """
+        removes up to quantity units of a product_id from the ledger.
+        :param product_id: a String
+        :param quantity: an int, not negative
+        :return: the number of units removed
+        """
+        quantity = _deductQuantity(quantity)
+        record = self.records.get(product_id)
+        if record is None:
+            return 0
+        removed = min(record.count, quantity)
+        record.count -= removed
+        self.nameCounts[record.product.name] -= removed
+        return removed
+
+    def count(self, product_id):
+        """
+        counts units on hand for a product_id.
+        :param product_id: a String
+        :return: an int
+        """
+        record = self.records.get(product_id)
+        return record.count if record is not None else 0
+
+    def countName(self, name):
+        """
+        counts units on hand for all products with the given name.
+        :param name: a String
+        :return: an int
+        """
+        return self.nameCounts.get(name, 0)
+
+    def productIds(self, name):
+        """
+        :param name: a String
+        :return: a list of the product_ids stocked under the name, in the order first stocked
+        """
+        return list(self.nameIds.get(name, ()))
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def __len__(self):
+        return len(self.records)
+
+
+class ConcurrentStockLedger(StockLedger):
+    """
+    StockLedger for a ConcurrentInventory, which locks each product_id while changing it.
+    The running counts per product name span several product_ids, so the ledger's own
+    update is also made under a short lock of its own, and iterating walks a copy of the
+    records so products added meanwhile do not break it.
+    """
+
+    def __init__(self, items=(), category=None, index=None):
+        self.lock = threading.Lock()
+        super().__init__(items, category, index)
+
+    def add(self, item, quantity):
+        with self.lock:
+            super().add(item, quantity)
+
+    def deduct(self, product_id, quantity):
+        with self.lock:
+            return super().deduct(product_id, quantity)
+
+    def productIds(self, name):
+        with self.lock:
+            return super().productIds(name)
+
+    def __iter__(self):
+        return iter(list(self.records.values()))
+
+
+SNAPSHOT_VERSION = 2
+
+PRODUCT_SPECS = {spec.product_class: spec for factory in HolidayMapper.factories.values()
+                 for spec in (factory.toy_spec, factory.stuffed_animal_spec, factory.candy_spec)}
+
+
+def _makeDetails(product_class, values):
+    """
+    rebuilds a product details record when unpickling, see ProductSpec.reduceDetails.
+    :param product_class: the product class whose spec made the record
+    :param values: a tuple of the record's fields
+    :return: a ProductSpec details record
+    """
+    return PRODUCT_SPECS[product_class].details._make(values)
+
+
+PRODUCT_HOLIDAYS = {spec.product_class: holiday for holiday, factory in HolidayMapper.factories.items()
+                    for spec in (factory.toy_spec, factory.stuffed_animal_spec, factory.candy_spec)}
+
+STOCK_LEVELS = Thresholds(DEFAULT_STOCK_LEVELS)
+
+
+class StockLog:
+    """
+    Append-only write-ahead log of inventory changes. Every entry is one pickle frame
+    written in a single call; a frame torn by a crash is dropped on recovery. Entries
+    appended inside group() are written as one frame, so they survive a crash together.
+    """
+
+    def __init__(self, filename, sync=False):
+        """
+        initializer for the stock log.
+        :param filename: a String
+        :param sync: a bool, fsync after every entry rather than only flushing
+        """
+        self.filename = filename
+        self.sync = sync
+        self.file = open(filename, 'ab')
+        self.grouped = None
+
+    def append(self, entry):
+        """
+        appends an entry to the log.
+        :param entry: a tuple
+        :return: None
+        """
+        if self.grouped is not None:
+            self.grouped.append(entry)
+            return
+        self.file.write(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+
+    @contextlib.contextmanager
+    def group(self):
+        """
+        collects the entries appended inside the block and writes them as a single
+        ('batch', None, entries, 0, None) entry when it ends. Groups nest into the outermost.
+        :return: a context manager
+        """
+        if self.grouped is not None:
+            yield self
+            return
+        self.grouped = []
+        try:
+            yield self
+        finally:
+            entries, self.grouped = self.grouped, None
+            if len(entries) == 1:
+                self.append(entries[0])
+            elif entries:
+                self.append(('batch', None, entries, 0, None))
+
+    def reset(self, generation):
+        """
+        empties the log and starts a new generation.
+        :param generation: an int, matching the snapshot the log builds on
+        :return: None
+        """
+        self.file.truncate(0)
+        self.append(('generation', generation))
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def recover(filename):
+        """
+        reads every complete entry from a log and cuts off a torn final entry, if any.
+        :param filename: a String
+        :return: a list of entries, empty if there is no log
+        """
+        if not os.path.exists(filename):
+            return []
+        entries = []
+        good_offset = 0
+        with open(filename, 'r+b') as f:
+            while True:
+                try:
+                    entries.append(pickle.load(f))
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                    break
+                good_offset = f.tell()
+            f.truncate(good_offset)
+        return entries
+
+
+class ConcurrentStockLog(StockLog):
+    """
+    StockLog that several threads append to. Frames are written under a lock so they never
+    interleave, and group() collects only the entries of the thread that opened it.
+    """
+
+    def __init__(self, filename, sync=False):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        super().__init__(filename, sync)
+
+    @property
+    def grouped(self):
+        return getattr(self.local, 'grouped', None)
+
+    @grouped.setter
+    def grouped(self, entries):
+        self.local.grouped = entries
+
+    def append(self, entry):
+        grouped = self.grouped
+        if grouped is not None:
+            grouped.append(entry)
+            return
+        with self.lock:
+            super().append(entry)
 
 
 class Inventory:
@@ -454,6 +1024,13 @@ class Inventory:
     Inventory class that maintains inventory of gifts for storefront.
     """
 
+    # stock level thresholds for checkInventory; assign a Thresholds to override per SKU or holiday
+    stockLevels = STOCK_LEVELS
+
+    ledgerClass = StockLedger
+
+    logClass = StockLog
+
     def __init__(self, toyInventory, stuffedAnimalInventory, candyInventory):
         """
         initializer for the inventory class.
@@ -461,93 +1038,80 @@ class Inventory:
         :param stuffedAnimalInventory: a list of StuffedAnimals
         :param candyInventory: a list of Candy
         """
-        self.toyInventory = toyInventory
-        self.stuffedAnimalInventory = stuffedAnimalInventory
-        self.candyInventory = candyInventory
+        self.index = {}
+        self.toyInventory = self.ledgerClass(toyInventory, Product.TOY, self.index)
+        self.stuffedAnimalInventory = self.ledgerClass(stuffedAnimalInventory, Product.STUFFED_ANIMAL, self.index)
+        self.candyInventory = self.ledgerClass(candyInventory, Product.CANDY, self.index)
+        self.ledgers = {
+            Product.TOY: self.toyInventory,
+            Product.STUFFED_ANIMAL: self.stuffedAnimalInventory,
+            Product.CANDY: self.candyInventory
+        }
+        self.log = None
+        self.snapshotFilename = None
+        self.generation = 0
+        # source -> [orders applied from the start of the file, order number of the last one,
+        #            orders from the start of the file flushed to the transaction report]
+        self.progress = {}
+        self.completedSources = set()
+        # transaction report filename -> (its size in bytes at the last markReported, that source)
+        self.reportMarks = {}
+        # source -> the merged stream its orders are being applied in, see markMerged
+        self.mergedSources = {}
 
     def countItemsToys(self, name):
         """
-        counts toys in toy inventory
+        counts toys in toy inventory, totalled over every product_id with the name.
         :param name: a String
         :return: an int
         """
-        i = 0
-
-        for toy in self.toyInventory:
-            if toy.name == name:
-                i += 1
-        return i
+        return self.toyInventory.countName(name)
 
     def countItemsAnimals(self, name):
         """
-        counts animals in stuffed animals inventory
+        counts animals in stuffed animals inventory, totalled over every product_id with the name.
         :param name: a String
         :return: an int
         """
-        i = 0
-
-        for animal in self.stuffedAnimalInventory:
-            if animal.name == name:
-                i += 1
-        return i
+        return self.stuffedAnimalInventory.countName(name)
 
     def countItemsCandy(self, name):
         """
-        counts candy in candy inventory
+        counts candy in candy inventory, totalled over every product_id with the name.
         :param name: a String
         :return: an int
         """
-        i = 0
-
-        for candy in self.candyInventory:
-            if candy.name == name:
-                i += 1
-        return i
+        return self.candyInventory.countName(name)
 
     def removeToy(self, item, quantity):
         """
-        removes toys from toy inventory
+        removes toys from toy inventory by name, from every product countItemsToys
+        counts under the item's name.
         :param item: Toy
         :param quantity: an int
         :return: None
         """
-        i = int(quantity)
-        for toy in self.toyInventory:
-            if i == 0:
-                return
-            if item.name == toy.name:
-                i -= 1
-                self.toyInventory.remove(toy)
+        self.deductName(self.toyInventory, item.name, quantity)
 
     def removeStuffedAnimal(self, item, quantity):
         """
-        removes stuffed animals from stuffed animals inventory
+        removes stuffed animals from stuffed animals inventory by name, from every product countItemsAnimals
+        counts under the item's name.
         :param item: StuffedAnimal
         :param quantity: an int
         :return: None
         """
-        i = int(quantity)
-        for stuffedAnimals in self.stuffedAnimalInventory:
-            if i == 0:
-                return
-            if item.name == stuffedAnimals.name:
-                i -= 1
-                self.stuffedAnimalInventory.remove(stuffedAnimals)
+        self.deductName(self.stuffedAnimalInventory, item.name, quantity)
 
     def removeCandy(self, item, quantity):
         """
-        removes candy from candy inventory
+        removes candy from candy inventory by name, from every product countItemsCandy
+        counts under the item's name.
         :param item: Candy
         :param quantity: an int
         :return: None
         """
-        i = int(quantity)
-        for candy in self.candyInventory:
-            if i == 0:
-                return
-            if item.name == candy.name:
-                i -= 1
-                self.candyInventory.remove(candy)
+        self.deductName(self.candyInventory, item.name, quantity)
 
     def addToys(self, item, quantity):
         """
@@ -556,8 +1120,7 @@ class Inventory:
         :param quantity: an int
         :return: None
         """
-        for i in range(quantity):
-            self.toyInventory.append(item)
+        self.addTo(self.toyInventory, item, quantity)
 
     def addStuffedAnimals(self, item, quantity):
         """
@@ -566,8 +1129,7 @@ class Inventory:
         :param quantity: an int
         :return: None
         """
-        for i in range(quantity):
-            self.stuffedAnimalInventory.append(item)
+        self.addTo(self.stuffedAnimalInventory, item, quantity)
 
     def addCandy(self, item, quantity):
         """
@@ -576,70 +1138,1670 @@ class Inventory:
         :param quantity: an int
         :return: None
         """
-        for i in range(quantity):
-            self.candyInventory.append(item)
+        self.addTo(self.candyInventory, item, quantity)
 
-    def checkInventory(self, product_id):
+    def addMany(self, category, items):
         """
-        allows users to search for items in their inventory by inventory id.
-        :param product_id: a String
+        adds stock for many products of one category as one write-ahead log entry.
+        :param category: a ProductEnum
+        :param items: an iterable of (product, quantity) tuples
         :return: None
         """
-        count = 0
-        for item in self.toyInventory:
-            if item.product_id == product_id:
-                count += 1
-        for item in self.candyInventory:
-            if item.product_id == product_id:
-                count += 1
-        for item in self.stuffedAnimalInventory:
-            if item.product_id == product_id:
-                count += 1
-        print(f"your search returned {count} result")
-        if count > 10:
-            print("item is in stock")
-        if 10 > count > 3:
-            print("item is low in stock")
-        if 3 > count > 0:
-            print("item is very low in stock")
-        if count == 0:
-            print("item is out stock")
+        ledger = self.ledgers[category]
+        with self.atomic():
+            for item, quantity in items:
+                self.addTo(ledger, item, quantity)
 
-    def print(self):
+    def addTo(self, ledger, item, quantity):
         """
-        Displays all objects in inventories -> for debug
+        adds stock to a ledger, recording the change in the write-ahead log if one is attached.
+        :param ledger: a StockLedger
+        :param item: a product
+        :param quantity: an int
         :return: None
         """
-        print("Printing inventory: ")
-        [print(item.name) for item in self.toyInventory]
-        [print(item.name) for item in self.stuffedAnimalInventory]
-        [print(item.name) for item in self.candyInventory]
+        if self.log is not None:
+            new_product = item if item.product_id not in ledger.records else None
+            self.log.append(('add', ledger.category.name, item.product_id, int(quantity), new_product))
+        ledger.add(item, quantity)
 
+    def deductName(self, ledger, name, quantity):
+        """
+        deducts up to quantity units across every product in a ledger with the given name,
+        taking from the products in the order they were first stocked, as the original
+        per-unit inventory lists did.
+        :param ledger: a StockLedger
+        :param name: a String
+        :param quantity: an int, not negative
+        :return: the number of units removed
+        """
+        remaining = quantity = _deductQuantity(quantity)
+        with self.atomic():
+            for product_id in ledger.productIds(name):
+                if not remaining:
+                    break
+                remaining -= self.deductFrom(ledger, product_id, remaining)
+        return quantity - remaining
 
-class Storefront:
-    """
-    Entry point for the user. Maintains Orders and Inventories.
-    """
+    def deductFrom(self, ledger, product_id, quantity):
+        """
+        deducts stock from a ledger, recording the change in the write-ahead log if one is attached.
+        :param ledger: a StockLedger
+        :param product_id: a String
+        :param quantity: an int
+        :return: the number of units removed
+        """
+        removed = ledger.deduct(product_id, quantity)
+        if self.log is not None and removed:
+            self.log.append(('deduct', ledger.category.name, product_id, removed, None))
+        return removed
 
-    def __init__(self, orders, inventory):
+    def markApplied(self, source, position, order_number):
         """
-        initializer for Storefront.
-        :param orders: list of Orders
-        :param inventory: Inventory
+        records in the write-ahead log that an order has been fully applied, so a run that
+        crashes part way through a file can resume after the last applied order.
+        :param source: a String identifying the file, see orderSource
+        :param position: an int, the order's position in the file, counting from 0
+        :param order_number: an int
+        :return: None
         """
-        self.orders = orders
-        self.inventory = inventory
+        if self.log is not None:
+            self.log.append(('applied', source, position, order_number, None))
+        progress = self.progress.setdefault(source, [0, None, 0])
+        progress[0], progress[1] = position + 1, order_number
 
-    def userMenu(self):
+    def markReported(self, source, through, mark=None):
         """
-        User menu -> application entry point.
+        records that the transaction report holds the orders of a file up to a position.
+        :param source: a String
+        :param through: an int, number of orders from the start of the file now in the report
+        :param mark: a tuple of (report filename, its size in bytes holding those orders), or None
         :return: None
         """
-        print("welcome to the Web Store!")
-        print("_________________________")
-        try:
-            while True:
-                userInput = input(f"enter: \n"
+        if self.log is not None:
+            self.log.append(('reported', source, through, 0, mark))
+        self.progress.setdefault(source, [0, None, 0])[2] = through
+        if mark is not None:
+            self.reportMarks[mark[0]] = (mark[1], source)
+
+    def reportMark(self, filename):
+        """
+        :param filename: a String, the transaction report's absolute filename
+        :return: a tuple of (size in bytes, source) recorded by the last markReported for the
+                 report, None if there is none
+        """
+        return self.reportMarks.get(filename)
+
+    def markMerged(self, sources, merged):
+        """
+        records that several files are applied as one stream merged by order number. Progress
+        is then kept for the merged stream only, so until it completes the files can only be
+        resumed by merging the same files again.
+        :param sources: a list of Strings identifying the files, see orderSource
+        :param merged: a String identifying the merged stream
+        :return: None
+        """
+        if self.log is not None:
+            self.log.append(('merged', merged, None, 0, tuple(sources)))
+        for source in sources:
+            self.mergedSources[source] = merged
+
+    def mergedInto(self, source):
+        """
+        :param source: a String
+        :return: a String identifying the merged stream the file was last applied in, None if
+                 it is not part of one, or the file has since completed
+        """
+        return self.mergedSources.get(source)
+
+    def appliedThrough(self, source):
+        """
+        :param source: a String
+        :return: an int, how many orders from the start of the file have been applied
+        """
+        return self.progress.get(source, (0, None, 0))[0]
+
+    def lastApplied(self, source):
+        """
+        :param source: a String
+        :return: the order number of the last order applied from the file, None if there is none
+        """
+        return self.progress.get(source, (0, None, 0))[1]
+
+    def reportedThrough(self, source):
+        """
+        :param source: a String
+        :return: an int, how many orders from the start of the file are in the transaction report
+        """
+        return self.progress.get(source, (0, None, 0))[2]
+
+    def markComplete(self, source):
+        """
+        records that every order in a file has been applied. Completed files are kept in the
+        snapshot for good, so applying the same file again is refused however much later.
+        :param source: a String
+        :return: None
+        """
+        if self.log is not None:
+            self.log.append(('complete', source, None, 0, None))
+        self.completedSources.add(source)
+        self.progress.pop(source, None)
+        self.mergedSources.pop(source, None)
+
+    def isComplete(self, source):
+        """
+        :param source: a String
+        :return: True if every order in the file has been applied
+        """
+        return source in self.completedSources
+
+    def ledgerFor(self, product_id):
+        """
+        finds the ledger that stocks a product_id.
+        :param product_id: a String
+        :return: a StockLedger, or None if the product has never been stocked
+        """
+        record = self.index.get(product_id)
+        if record is None:
+            return None
+        return self.ledgers[record.category]
+
+    def deduct(self, product_id, quantity):
+        """
+        removes up to quantity units of a product_id from whichever inventory stocks it.
+        :param product_id: a String
+        :param quantity: an int, not negative
+        :return: the number of units removed
+        """
+        _deductQuantity(quantity)
+        ledger = self.ledgerFor(product_id)
+        if ledger is None:
+            return 0
+        return self.deductFrom(ledger, product_id, quantity)
+
+    def deductMany(self, deductions):
+        """
+        applies a batch of deductions, such as a whole day's orders, at once.
+        Quantities for the same product_id are summed so each SKU is touched once.
+        A negative quantity anywhere in the batch is refused before anything is deducted.
+        :param deductions: an iterable of (product_id, quantity) tuples
+        :return: dict of product_id to the number of units removed
+        """
+        totals = {}
+        for product_id, quantity in deductions:
+            totals[product_id] = totals.get(product_id, 0) + _deductQuantity(quantity)
+        return {product_id: self.deduct(product_id, quantity) for product_id, quantity in totals.items()}
+
+    def saveSnapshot(self, filename, generation=None):
+        """
+        saves every stocked product and its on-hand count to a snapshot file. Products are
+        stored column-wise per product class so a snapshot loads without unpickling each object.
+        The file is replaced atomically so a crash never leaves a partial snapshot.
+        :param filename: a String
+        :param generation: an int, the write-ahead log generation this snapshot includes
+        :return: None
+        """
+        groups = {}
+        for category, ledger in self.ledgers.items():
+            for record in ledger:
+                product_class = type(record.product)
+                key = (category.name, product_class.__name__)
+                if key not in groups:
+                    groups[key] = ([], PRODUCT_SPECS[product_class].fields)
+                groups[key][0].append(record)
+        stock = []
+        for (category, class_name), (records, fields) in groups.items():
+            columns = [[getattr(record.product, field) for record in records] for field in fields]
+            stock.append((category, class_name, columns, [record.count for record in records]))
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'generation': self.generation if generation is None else generation,
+            'stock': stock,
+            'progress': self.progress,
+            'completed': sorted(self.completedSources),
+            'reportMarks': self.reportMarks,
+            'merged': self.mergedSources
+        }
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+
+    @classmethod
+    def loadSnapshot(cls, filename):
+        """
+        restores an inventory saved by saveSnapshot.
+        :param filename: a String
+        :return: an Inventory
+        """
+        with open(filename, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported inventory snapshot: {filename}")
+        inventory = cls([], [], [])
+        inventory.generation = snapshot['generation']
+        inventory.progress = snapshot.get('progress', {})
+        inventory.completedSources = set(snapshot.get('completed', ()))
+        inventory.reportMarks = snapshot.get('reportMarks', {})
+        inventory.mergedSources = snapshot.get('merged', {})
+        classes = {product_class.__name__: product_class for product_class in PRODUCT_SPECS}
+        with _gcDisabled():
+            for category, class_name, columns, counts in snapshot['stock']:
+                product_class = classes[class_name]
+                inventory.ledgers[Product[category]].load(
+                    [product_class(*values) for values in zip(*columns)], counts)
+        return inventory
+
+    @classmethod
+    def open(cls, snapshotFilename, logFilename=None, sync=False):
+        """
+        warm starts an inventory from its snapshot and replays the write-ahead log written
+        since that snapshot, recovering every stock change made before a crash. The log
+        stays attached so further changes are appended to it.
+        :param snapshotFilename: a String
+        :param logFilename: a String, defaults to the snapshot filename plus ".wal"
+        :param sync: a bool, fsync the log after every change
+        :return: an Inventory
+        """
+        if os.path.exists(snapshotFilename):
+            inventory = cls.loadSnapshot(snapshotFilename)
+        else:
+            inventory = cls([], [], [])
+        inventory.snapshotFilename = snapshotFilename
+        logFilename = logFilename or f"{snapshotFilename}.wal"
+
+        entries = StockLog.recover(logFilename)
+        if entries and entries[0] == ('generation', inventory.generation):
+            for entry in entries[1:]:
+                inventory.replay(entry)
+            inventory.log = cls.logClass(logFilename, sync)
+        else:
+            # the log is missing or older than the snapshot, which already includes its changes
+            inventory.log = cls.logClass(logFilename, sync)
+            inventory.log.reset(inventory.generation)
+        return inventory
+
+    def replay(self, entry):
+        """
+        re-applies one write-ahead log entry without logging it again.
+        :param entry: a tuple of (operation, category or source, key, quantity, product)
+        :return: None
+        """
+        operation, category, key, quantity, product = entry
+        if operation == 'batch':
+            for grouped in key:
+                self.replay(grouped)
+            return
+        if operation == 'applied':
+            progress = self.progress.setdefault(category, [0, None, 0])
+            progress[0], progress[1] = key + 1, quantity
+            return
+        if operation == 'reported':
+            self.progress.setdefault(category, [0, None, 0])[2] = key
+            if product is not None:
+                self.reportMarks[product[0]] = (product[1], category)
+            return
+        if operation == 'merged':
+            for source in product:
+                self.mergedSources[source] = category
+            return
+        if operation == 'complete':
+            self.completedSources.add(category)
+            self.progress.pop(category, None)
+            self.mergedSources.pop(category, None)
+            return
+        ledger = self.ledgers[Product[category]]
+        if operation == 'add':
+            ledger.add(product if product is not None else self.index[key].product, quantity)
+        elif operation == 'deduct':
+            ledger.deduct(key, quantity)
+
+    def checkpoint(self):
+        """
+        writes a fresh snapshot and starts a new, empty write-ahead log generation.
+        :return: None
+        """
+        if self.snapshotFilename is None:
+            raise ValueError("inventory was not opened from a snapshot")
+        self.generation += 1
+        self.saveSnapshot(self.snapshotFilename)
+        if self.log is not None:
+            self.log.reset(self.generation)
+
+    def close(self):
+        """
+        closes the write-ahead log, if one is attached.
+        :return: None
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def checkInventory(self, product_id):
+        """
+        allows users to search for items in their inventory by inventory id.
+        :param product_id: a String
+        :return: a StockCheck
+        """
+        record = self.index.get(product_id)
+        if record is None:
+            return StockCheck(product_id, 0, None)
+        stock_levels = self.stockLevels
+        if stock_levels.byProduct or stock_levels.byHoliday:
+            levels = stock_levels.get(product_id, PRODUCT_HOLIDAYS.get(type(record.product)))
+        else:
+            levels = stock_levels.default
+        return StockCheck(product_id, record.count, record.category, levels)
+
+    def checkMany(self, product_ids):
+        """
+        checks stock for many product ids at once, e.g. to refresh the website's stock badges.
+        :param product_ids: an iterable of Strings
+        :return: dict of product_id to StockCheck
+        """
+        return {product_id: self.checkInventory(product_id) for product_id in product_ids}
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        groups a batch of changes. The in-memory inventory applies changes immediately,
+        so this only exists to give every inventory backend the same interface.
+        :return: a context manager
+        """
+        yield self
+
+    def atomic(self):
+        """
+        logs the changes made inside the block as one write-ahead log entry, so after a
+        crash they are recovered all together or not at all.
+        :return: a context manager
+        """
+        if self.log is None:
+            return contextlib.nullcontext(self)
+        return self.log.group()
+
+    def print(self):
+        """
+        Displays all objects in inventories -> for debug
+        :return: None
+        """
+        print("Printing inventory: ")
+        [print(f"{record.product.name} x{record.count}") for record in self.toyInventory]
+        [print(f"{record.product.name} x{record.count}") for record in self.stuffedAnimalInventory]
+        [print(f"{record.product.name} x{record.count}") for record in self.candyInventory]
+
+
+LOCK_STRIPES = 64
+
+
+class ConcurrentInventory(Inventory):
+    """
+    An Inventory that can be shared between threads, e.g. a batch applying orders while the
+    intake service or another terminal checks stock. Each stock change locks only its
+    product_id, through one of a fixed set of striped locks, so changes to different
+    products do not hold each other up. Reads take no lock: a count is updated in a single
+    assignment, so checkInventory always sees a whole value and never waits behind a
+    createOrder batch.
+
+    atomic() blocks run one at a time and keep every product they check or change locked
+    until they end. An order's stock check and the change it leads to cannot be split by
+    another writer, and the write-ahead log holds each product's changes in the order
+    they were made.
+    """
+
+    ledgerClass = ConcurrentStockLedger
+
+    logClass = ConcurrentStockLog
+
+    def __init__(self, toyInventory, stuffedAnimalInventory, candyInventory, stripes=LOCK_STRIPES):
+        """
+        initializer for the concurrent inventory.
+        :param toyInventory: a list of Toys
+        :param stuffedAnimalInventory: a list of StuffedAnimals
+        :param candyInventory: a list of Candy
+        :param stripes: an int, number of locks product_ids are spread over
+        """
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.atomicLock = threading.Lock()
+        self.progressLock = threading.Lock()
+        # per thread: the stripes held by its atomic() block, and whether it holds exclusive()
+        self.local = threading.local()
+        super().__init__(toyInventory, stuffedAnimalInventory, candyInventory)
+
+    def lockFor(self, product_id):
+        """
+        locks the stripe of a product_id, for one change or, inside atomic(), until the block ends.
+        :param product_id: a String
+        :return: the lock to release after the change, None if the atomic() block holds it
+        """
+        stripe = hash(product_id) % len(self.locks)
+        held = getattr(self.local, 'held', None)
+        if held is not None and stripe in held:
+            return None
+        lock = self.locks[stripe]
+        lock.acquire()
+        if held is not None:
+            held.add(stripe)
+            return None
+        return lock
+
+    def addTo(self, ledger, item, quantity):
+        lock = self.lockFor(item.product_id)
+        try:
+            super().addTo(ledger, item, quantity)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def deductFrom(self, ledger, product_id, quantity):
+        lock = self.lockFor(product_id)
+        try:
+            return super().deductFrom(ledger, product_id, quantity)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def checkInventory(self, product_id):
+        """
+        checks stock without waiting for writers. Inside atomic() the product is locked
+        for the rest of the block, so the count cannot change before the order acts on it.
+        :param product_id: a String
+        :return: a StockCheck
+        """
+        if getattr(self.local, 'held', None) is not None:
+            self.lockFor(product_id)
+        return super().checkInventory(product_id)
+
+    def markApplied(self, source, position, order_number):
+        with self.progressLock:
+            super().markApplied(source, position, order_number)
+
+    def markReported(self, source, through, mark=None):
+        with self.progressLock:
+            super().markReported(source, through, mark)
+
+    def markMerged(self, sources, merged):
+        with self.progressLock:
+            super().markMerged(sources, merged)
+
+    def markComplete(self, source):
+        with self.progressLock:
+            super().markComplete(source)
+
+    @contextlib.contextmanager
+    def atomic(self):
+        """
+        runs the block as one write-ahead log entry while no other atomic() block runs,
+        keeping the products it touches locked until it ends. Blocks nest into the outermost.
+        :return: a context manager
+        """
+        if getattr(self.local, 'held', None) is not None:
+            yield self
+            return
+        with self.atomicLock:
+            self.local.held = set()
+            try:
+                with super().atomic():
+                    yield self
+            finally:
+                held, self.local.held = self.local.held, None
+                for stripe in held:
+                    self.locks[stripe].release()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """
+        holds off every writer, for work that reads or replaces the whole inventory.
+        :return: a context manager
+        """
+        if getattr(self.local, 'exclusive', False):
+            yield self
+            return
+        with self.atomicLock:
+            for lock in self.locks:
+                lock.acquire()
+            self.progressLock.acquire()
+            self.local.exclusive = True
+            try:
+                yield self
+            finally:
+                self.local.exclusive = False
+                self.progressLock.release()
+                for lock in self.locks:
+                    lock.release()
+
+    def saveSnapshot(self, filename, generation=None):
+        with self.exclusive():
+            super().saveSnapshot(filename, generation)
+
+    def checkpoint(self):
+        with self.exclusive():
+            super().checkpoint()
+
+    def close(self):
+        with self.exclusive():
+            super().close()
+
+
+class SqliteInventory:
+    """
+    Inventory backed by an SQLite database, with the same add/remove/count API as Inventory.
+    Several processes can share one database file; the database runs in WAL journal mode
+    so readers do not block behind a writer.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS stock (
+               product_id TEXT PRIMARY KEY,
+               category TEXT NOT NULL,
+               name TEXT NOT NULL,
+               count INTEGER NOT NULL DEFAULT 0,
+               product BLOB NOT NULL)""",
+        "CREATE INDEX IF NOT EXISTS stock_name ON stock (category, name)",
+        """CREATE TABLE IF NOT EXISTS order_progress (
+               source TEXT PRIMARY KEY,
+               applied INTEGER NOT NULL DEFAULT 0,
+               last_order_number INTEGER,
+               reported INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID""",
+        "CREATE TABLE IF NOT EXISTS completed_sources (source TEXT PRIMARY KEY) WITHOUT ROWID",
+        """CREATE TABLE IF NOT EXISTS report_marks (
+               filename TEXT PRIMARY KEY,
+               size INTEGER NOT NULL,
+               source TEXT NOT NULL) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS merged_sources (
+               source TEXT PRIMARY KEY,
+               merged TEXT NOT NULL) WITHOUT ROWID"""
+    )
+
+    ADD = ("INSERT INTO stock (product_id, category, name, count, product) VALUES (?, ?, ?, ?, ?) "
+           "ON CONFLICT (product_id) DO UPDATE SET count = count + excluded.count")
+    DEDUCT = "UPDATE stock SET count = count - MIN(count, ?) WHERE product_id = ?"
+    COUNT_NAME = "SELECT COALESCE(SUM(count), 0) FROM stock WHERE category = ? AND name = ?"
+    STOCK_NAME = "SELECT product_id, count FROM stock WHERE category = ? AND name = ? AND count > 0 ORDER BY rowid"
+    COUNT_ID = "SELECT count, category FROM stock WHERE product_id = ?"
+    PRODUCT_ID = "SELECT product FROM stock WHERE product_id = ?"
+
+    # stock level thresholds for checkInventory, see Inventory.stockLevels
+    stockLevels = STOCK_LEVELS
+
+    def __init__(self, filename, timeout=30.0):
+        """
+        initializer for the SQLite inventory.
+        :param filename: a String, the database file, or ":memory:"
+        :param timeout: a float, seconds to wait for another process's write lock
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        self.depth = 0
+        self.atomicDepth = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        applies every change made inside the block as one transaction, rolled back on error.
+        Transactions nest; only the outermost one commits.
+        :return: a context manager
+        """
+        if self.depth == 0:
+            self.connection.execute("BEGIN IMMEDIATE")
+        self.depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.depth -= 1
+            if self.depth == 0:
+                self.connection.execute("ROLLBACK")
+            raise
+        self.depth -= 1
+        if self.depth == 0:
+            self.connection.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def atomic(self):
+        """
+        makes the changes inside the block atomic, see Inventory.atomic.
+        :return: a context manager
+        """
+        self.atomicDepth += 1
+        try:
+            with self.transaction():
+                yield self
+        finally:
+            self.atomicDepth -= 1
+
+    def commitProgress(self):
+        """
+        commits the open transaction and starts a new one, unless an atomic() block is
+        running, so everything applied so far survives a crash later in the transaction.
+        :return: None
+        """
+        if self.depth and not self.atomicDepth:
+            self.connection.execute("COMMIT")
+            self.connection.execute("BEGIN IMMEDIATE")
+
+    def add(self, category, item, quantity):
+        """
+        adds stock for a product.
+        :param category: a ProductEnum
+        :param item: a product
+        :param quantity: an int
+        :return: None
+        """
+        self.connection.execute(self.ADD, (item.product_id, category.name, item.name, int(quantity),
+                                           pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def addMany(self, category, items):
+        """
+        adds stock for many products with one prepared statement.
+        :param category: a ProductEnum
+        :param items: an iterable of (product, quantity) tuples
+        :return: None
+        """
+        with self.transaction():
+            self.connection.executemany(self.ADD, (
+                (item.product_id, category.name, item.name, int(quantity),
+                 pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+                for item, quantity in items))
+
+    def countName(self, category, name):
+        """
+        counts units on hand for all products of a category with the given name.
+        :param category: a ProductEnum
+        :param name: a String
+        :return: an int
+        """
+        return self.connection.execute(self.COUNT_NAME, (category.name, name)).fetchone()[0]
+
+    def countItemsToys(self, name):
+        """
+        counts toys in toy inventory, totalled over every product_id with the name.
+        :param name: a String
+        :return: an int
+        """
+        return self.countName(Product.TOY, name)
+
+    def countItemsAnimals(self, name):
+        """
+        counts animals in stuffed animals inventory, totalled over every product_id with the name.
+        :param name: a String
+        :return: an int
+        """
+        return self.countName(Product.STUFFED_ANIMAL, name)
+
+    def countItemsCandy(self, name):
+        """
+        counts candy in candy inventory, totalled over every product_id with the name.
+        :param name: a String
+        :return: an int
+        """
+        return self.countName(Product.CANDY, name)
+
+    def removeToy(self, item, quantity):
+        """
+        removes toys from toy inventory by name, from every product countItemsToys
+        counts under the item's name.
+        :param item: Toy
+        :param quantity: an int
+        :return: None
+        """
+        self.deductName(Product.TOY, item.name, quantity)
+
+    def removeStuffedAnimal(self, item, quantity):
+        """
+        removes stuffed animals from stuffed animals inventory by name, from every product countItemsAnimals
+        counts under the item's name.
+        :param item: StuffedAnimal
+        :param quantity: an int
+        :return: None
+        """
+        self.deductName(Product.STUFFED_ANIMAL, item.name, quantity)
+
+    def removeCandy(self, item, quantity):
+        """
+        removes candy from candy inventory by name, from every product countItemsCandy
+        counts under the item's name.
+        :param item: Candy
+        :param quantity: an int
+        :return: None
+        """
+        self.deductName(Product.CANDY, item.name, quantity)
+
+    def addToys(self, item, quantity):
+        """
+        adds toys to toys inventory.
+        :param item: Toys
+        :param quantity: an int
+        :return: None
+        """
+        self.add(Product.TOY, item, quantity)
+
+    def addStuffedAnimals(self, item, quantity):
+        """
+        adds stuffed animals to stuffed animals inventory.
+        :param item: StuffedAnimal
+        :param quantity: an int
+        :return: None
+        """
+        self.add(Product.STUFFED_ANIMAL, item, quantity)
+
+    def addCandy(self, item, quantity):
+        """
+        adds candy to candy inventory.
+        :param item: Candy
+        :param quantity: an int
+        :return: None
+        """
+        self.add(Product.CANDY, item, quantity)
+
+    def deduct(self, product_id, quantity):
+        """
+        removes up to quantity units of a product_id.
+        :param product_id: a String
+        :param quantity: an int, not negative
+        :return: the number of units removed
+        """
+        quantity = _deductQuantity(quantity)
+        with self.transaction():
+            row = self.connection.execute(self.COUNT_ID, (product_id,)).fetchone()
+            if row is None:
+                return 0
+            removed = min(row[0], quantity)
+            if removed:
+                self.connection.execute(self.DEDUCT, (removed, product_id))
+            return removed
+
+    def deductName(self, category, name, quantity):
+        """
+        removes up to quantity units across every product of a category with the given name,
+        see Inventory.deductName.
+        :param category: a ProductEnum
+        :param name: a String
+        :param quantity: an int, not negative
+        :return: the number of units removed
+        """
+        remaining = quantity = _deductQuantity(quantity)
+        with self.transaction():
+            for product_id, count in self.connection.execute(self.STOCK_NAME, (category.name, name)).fetchall():
+                if not remaining:
+                    break
+                removed = min(count, remaining)
+                self.connection.execute(self.DEDUCT, (removed, product_id))
+                remaining -= removed
+        return quantity - remaining
+
+    def deductMany(self, deductions):
+        """
+        applies a batch of deductions in one transaction with one prepared statement.
+        A negative quantity anywhere in the batch is refused before anything is deducted.
+        :param deductions: an iterable of (product_id, quantity) tuples
+        :return: dict of product_id to the number of units removed
+        """
+        totals = {}
+        for product_id, quantity in deductions:
+            totals[product_id] = totals.get(product_id, 0) + _deductQuantity(quantity)
+        with self.transaction():
+            counts = {product_id: check.count for product_id, check in self.checkMany(totals).items()}
+            removed = {product_id: min(counts[product_id], quantity) for product_id, quantity in totals.items()}
+            self.connection.executemany(self.DEDUCT, ((quantity, product_id)
+                                                      for product_id, quantity in removed.items() if quantity))
+        return removed
+
+    def markApplied(self, source, position, order_number):
+        """
+        records that an order has been fully applied, see Inventory.markApplied.
+        :param source: a String
+        :param position: an int
+        :param order_number: an int
+        :return: None
+        """
+        self.connection.execute("INSERT INTO order_progress (source, applied, last_order_number) VALUES (?, ?, ?) "
+                                "ON CONFLICT (source) DO UPDATE SET applied = excluded.applied, "
+                                "last_order_number = excluded.last_order_number",
+                                (source, position + 1, order_number))
+
+    def markReported(self, source, through, mark=None):
+        """
+        records that the transaction report holds the orders of a file up to a position.
+        Those lines are already on disk, so the mark is committed at once, together with
+        the stock changes and progress before it; a crash later in a long transaction then
+        cannot roll progress back behind the report and have the orders reported twice.
+        :param source: a String
+        :param through: an int
+        :param mark: a tuple of (report filename, its size in bytes holding those orders), or None
+        :return: None
+        """
+        self.connection.execute("INSERT INTO order_progress (source, reported) VALUES (?, ?) "
+                                "ON CONFLICT (source) DO UPDATE SET reported = excluded.reported", (source, through))
+        if mark is not None:
+            self.connection.execute("INSERT OR REPLACE INTO report_marks (filename, size, source) VALUES (?, ?, ?)",
+                                    (mark[0], mark[1], source))
+        self.commitProgress()
+
+    def reportMark(self, filename):
+        """
+        :param filename: a String, the transaction report's absolute filename
+        :return: a tuple of (size in bytes, source), see Inventory.reportMark
+        """
+        return self.connection.execute("SELECT size, source FROM report_marks WHERE filename = ?",
+                                       (filename,)).fetchone()
+
+    def markMerged(self, sources, merged):
+        """
+        records that several files are applied as one merged stream, see Inventory.markMerged.
+        :param sources: a list of Strings
+        :param merged: a String
+        :return: None
+        """
+        with self.transaction():
+            self.connection.executemany("INSERT OR REPLACE INTO merged_sources (source, merged) VALUES (?, ?)",
+                                        ((source, merged) for source in sources))
+
+    def mergedInto(self, source):
+        """
+        :param source: a String
+        :return: a String identifying the merged stream the file was last applied in, or None
+        """
+        row = self.connection.execute("SELECT merged FROM merged_sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row is not None else None
+
+    def appliedThrough(self, source):
+        """
+        :param source: a String
+        :return: an int, how many orders from the start of the file have been applied
+        """
+        row = self.connection.execute("SELECT applied FROM order_progress WHERE source = ?", (source,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def lastApplied(self, source):
+        """
+        :param source: a String
+        :return: the order number of the last order applied from the file, None if there is none
+        """
+        row = self.connection.execute("SELECT last_order_number FROM order_progress WHERE source = ?",
+                                      (source,)).fetchone()
+        return row[0] if row is not None else None
+
+    def reportedThrough(self, source):
+        """
+        :param source: a String
+        :return: an int, how many orders from the start of the file are in the transaction report
+        """
+        row = self.connection.execute("SELECT reported FROM order_progress WHERE source = ?", (source,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def markComplete(self, source):
+        """
+        records that every order in a file has been applied.
+        :param source: a String
+        :return: None
+        """
+        with self.transaction():
+            self.connection.execute("INSERT OR IGNORE INTO completed_sources (source) VALUES (?)", (source,))
+            self.connection.execute("DELETE FROM order_progress WHERE source = ?", (source,))
+            self.connection.execute("DELETE FROM merged_sources WHERE source = ?", (source,))
+
+    def isComplete(self, source):
+        """
+        :param source: a String
+        :return: True if every order in the file has been applied
+        """
+        return self.connection.execute("SELECT 1 FROM completed_sources WHERE source = ?",
+                                       (source,)).fetchone() is not None
+
+    def checkInventory(self, product_id):
+        """
+        allows users to search for items in their inventory by inventory id.
+        :param product_id: a String
+        :return: a StockCheck
+        """
+        row = self.connection.execute(self.COUNT_ID, (product_id,)).fetchone()
+        if row is None:
+            return StockCheck(product_id, 0, None)
+        return StockCheck(product_id, row[0], Product[row[1]], self.levelsFor(product_id))
+
+    def levelsFor(self, product_id):
+        """
+        :param product_id: a String
+        :return: the stock level thresholds for a stocked product. The product is only
+                 loaded when thresholds are overridden per holiday.
+        """
+        holiday = None
+        if self.stockLevels.byHoliday:
+            row = self.connection.execute(self.PRODUCT_ID, (product_id,)).fetchone()
+            holiday = PRODUCT_HOLIDAYS.get(type(pickle.loads(row[0])))
+        return self.stockLevels.get(product_id, holiday)
+
+    def checkMany(self, product_ids):
+        """
+        checks stock for many product ids at once.
+        :param product_ids: an iterable of Strings
+        :return: dict of product_id to StockCheck
+        """
+        product_ids = list(product_ids)
+        found = {}
+        # stay under SQLite's limit on bound parameters per statement
+        for start in range(0, len(product_ids), 500):
+            batch = product_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            for product_id, count, category in self.connection.execute(
+                    f"SELECT product_id, count, category FROM stock WHERE product_id IN ({placeholders})", batch):
+                found[product_id] = StockCheck(product_id, count, Product[category], self.levelsFor(product_id))
+        return {product_id: found.get(product_id, StockCheck(product_id, 0, None)) for product_id in product_ids}
+
+    def checkpoint(self):
+        """
+        marks a run as complete. SQLite already commits every transaction durably, so this
+        only folds SQLite's own write-ahead log back into the database file.
+        :return: None
+        """
+        self.connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        """
+        closes the database connection.
+        :return: None
+        """
+        self.connection.close()
+
+    def print(self):
+        """
+        Displays all objects in inventories -> for debug
+        :return: None
+        """
+        print("Printing inventory: ")
+        for name, count in self.connection.execute("SELECT name, count FROM stock ORDER BY category, name"):
+            print(f"{name} x{count}")
+
+
+class StageTimer:
+    """
+    Context manager that adds the time spent inside it to a Metrics stage.
+    """
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.addStageTime(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Lightweight run instrumentation: per stage timers, named counters and per product
+    counters, exportable as a summary table or a Prometheus text file.
+    """
+
+    def __init__(self):
+        self.stageSeconds = {}
+        self.stageCalls = {}
+        self.counters = {}
+        self.productUnits = {}
+
+    def stage(self, name):
+        """
+        times a block of work, e.g. ``with metrics.stage("parse"):``
+        :param name: a String
+        :return: a context manager
+        """
+        return StageTimer(self, name)
+
+    def addStageTime(self, name, seconds):
+        self.stageSeconds[name] = self.stageSeconds.get(name, 0.0) + seconds
+        self.stageCalls[name] = self.stageCalls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        """
+        adds to a named counter.
+        :param name: a String
+        :param amount: an int
+        :return: None
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def countProduct(self, product_id, amount=1):
+        """
+        adds to the units counted for a product.
+        :param product_id: a String
+        :param amount: an int
+        :return: None
+        """
+        self.productUnits[product_id] = self.productUnits.get(product_id, 0) + amount
+
+    def summary(self, topProducts=10):
+        """
+        formats the timings and counters as a table.
+        :param topProducts: an int, number of busiest products to list
+        :return: a String
+        """
+        total = sum(self.stageSeconds.values())
+        lines = [f"{'stage':<12} {'seconds':>10} {'calls':>10} {'share':>7}"]
+        for name, seconds in sorted(self.stageSeconds.items(), key=lambda entry: -entry[1]):
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"{name:<12} {seconds:>10.3f} {self.stageCalls[name]:>10} {share:>6.1f}%")
+        lines.append("")
+        lines.extend(f"{name:<24} {value:>10}" for name, value in sorted(self.counters.items()))
+        if self.productUnits:
+            lines.append("")
+            lines.append(f"{'product_id':<24} {'units':>10}")
+            busiest = sorted(self.productUnits.items(), key=lambda entry: -entry[1])[:topProducts]
+            lines.extend(f"{product_id:<24} {units:>10}" for product_id, units in busiest)
+        return "\n".join(lines)
+
+    def writePrometheus(self, filename, prefix="supplychain"):
+        """
+        writes the metrics in the Prometheus text exposition format, e.g. for the node
+        exporter's textfile collector. The file is replaced atomically.
+        :param filename: a String
+        :param prefix: a String prepended to every metric name
+        :return: None
+        """
+        lines = [f"# TYPE {prefix}_stage_seconds_total counter"]
+        lines.extend(f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+                     for name, seconds in sorted(self.stageSeconds.items()))
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        lines.extend(f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}'
+                     for name, calls in sorted(self.stageCalls.items()))
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        lines.append(f"# TYPE {prefix}_product_units_total counter")
+        lines.extend(f'{prefix}_product_units_total{{product_id="{product_id}"}} {units}'
+                     for product_id, units in sorted(self.productUnits.items()))
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_filename, filename)
+
+
+class NullMetrics(Metrics):
+    """
+    Metrics that records nothing, used when instrumentation is off.
+    """
+    nullStage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self.nullStage
+
+    def addStageTime(self, name, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def countProduct(self, product_id, amount=1):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+@contextlib.contextmanager
+def profiled(filename):
+    """
+    runs a block under cProfile and saves the stats, e.g. for one slow daily run.
+    Inspect them with ``python -m pstats <filename>``.
+    :param filename: a String
+    :return: a context manager
+    """
+    import cProfile
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        profile.dump_stats(filename)
+
+
+REPORT_FLUSH_EVERY = 100
+
+
+class TransactionReport(abc.ABC):
+    """
+    The base transaction report. Orders are appended through a buffered writer as they
+    are applied, flushed every few orders, so nothing needs to be kept in memory and a
+    crash loses at most the last unflushed orders. An existing report is appended to
+    unless append is off, in which case it is replaced as the original report was.
+    """
+
+    def __init__(self, filename, flushEvery=REPORT_FLUSH_EVERY, sync=False, append=True):
+        """
+        initializer for a transaction report.
+        :param filename: a String
+        :param flushEvery: an int, number of orders between flushes
+        :param sync: a bool, fsync on every flush
+        :param append: a bool, add to an existing report rather than starting a new one
+        """
+        self.filename = filename
+        self.flushEvery = flushEvery
+        self.sync = sync
+        self.pending = 0
+        is_new = not append or not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.file = open(filename, 'a' if append else 'w', newline='', encoding='utf-8', buffering=1 << 16)
+        if is_new:
+            self.writeHeader()
+            self.flush()
+
+    @abc.abstractmethod
+    def writeHeader(self):
+        pass
+
+    @abc.abstractmethod
+    def writeOrder(self, order):
+        pass
+
+    def write(self, order):
+        """
+        appends an order to the report.
+        :param order: an Order
+        :return: None
+        """
+        self.writeOrder(order)
+        self.pending += 1
+        if self.pending >= self.flushEvery:
+            self.flush()
+
+    def flush(self):
+        """
+        pushes buffered orders to the file, and to disk if sync is on.
+        :return: None
+        """
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def mark(self):
+        """
+        :return: a tuple of (absolute filename, size in bytes) of the report as flushed so far
+        """
+        return os.path.abspath(self.filename), os.fstat(self.file.fileno()).st_size
+
+    def truncate(self, size):
+        """
+        drops everything after the first size bytes of the report, including orders not yet flushed.
+        :param size: an int
+        :return: None
+        """
+        self.file.truncate(size)
+        self.pending = 0
+
+    def close(self):
+        """
+        flushes and closes the report.
+        :return: None
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class TextTransactionReport(TransactionReport):
+    """
+    The original plain text daily transaction report.
+    """
+
+    def writeHeader(self):
+        self.file.write("WEB STORE - Daily Transaction Report \n")
+        self.file.write(f"{date.today().strftime('%b-%d-%Y')} \n")
+
+    def writeOrder(self, order):
+        self.file.write(order.__str__())
+
+
+class CsvTransactionReport(TransactionReport):
+    """
+    Transaction report as CSV, one row per order.
+    """
+    columns = ('order_number', 'holiday', 'item', 'product_id', 'name', 'quantity')
+
+    def __init__(self, filename, flushEvery=REPORT_FLUSH_EVERY, sync=False, append=True):
+        self.writer = None
+        super().__init__(filename, flushEvery, sync, append)
+
+    def writeHeader(self):
+        self.csvWriter().writerow(self.columns)
+
+    def writeOrder(self, order):
+        self.csvWriter().writerow(order.toRecord())
+
+    def csvWriter(self):
+        if self.writer is None:
+            self.writer = csv.writer(self.file)
+        return self.writer
+
+
+class JsonLinesTransactionReport(TransactionReport):
+    """
+    Transaction report as JSON Lines, one order object per line.
+    """
+
+    def writeHeader(self):
+        pass
+
+    def writeOrder(self, order):
+        self.file.write(json.dumps(dict(zip(CsvTransactionReport.columns, order.toRecord())), default=str))
+        self.file.write("\n")
+
+
+class ReportMapper:
+    """
+    class that maps report file extensions to transaction report types.
+    """
+    report_mapper = {
+        ".txt": TextTransactionReport,
+        ".csv": CsvTransactionReport,
+        ".jsonl": JsonLinesTransactionReport,
+        ".ndjson": JsonLinesTransactionReport
+    }
+
+    def get_report(self, filename, flushEvery=REPORT_FLUSH_EVERY, sync=False, append=True) -> TransactionReport:
+        """
+        Opens the transaction report type matching the file extension, plain text if unknown
+        :param filename: a String
+        :param flushEvery: an int, number of orders between flushes
+        :param sync: a bool, fsync on every flush
+        :param append: a bool, add to an existing report rather than replacing it
+        :return: a TransactionReport
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        report_class = self.report_mapper.get(extension, TextTransactionReport)
+        return report_class(filename, flushEvery, sync, append)
+
+
+RESTOCK_QUANTITY = 100
+
+DEMAND_WINDOW = 50
+
+
+class DemandHistory:
+    """
+    Recent demand per product. Time is counted in order lines, so a product's demand
+    rate is the units it sold per order line over its last few orders.
+    """
+
+    def __init__(self, window=DEMAND_WINDOW):
+        """
+        initializer for the demand history.
+        :param window: an int, number of recent orders remembered per product
+        """
+        self.window = window
+        self.orderLines = 0
+        # product_id -> [deque of (order line, quantity), units in the deque, order line the deque starts after]
+        self.recent = {}
+
+    def record(self, product_id, quantity):
+        """
+        :param product_id: a String
+        :param quantity: an int
+        :return: None
+        """
+        self.orderLines += 1
+        history = self.recent.get(product_id)
+        if history is None:
+            history = self.recent[product_id] = [collections.deque(), 0, 0]
+        orders = history[0]
+        if len(orders) == self.window:
+            history[2], evicted = orders.popleft()
+            history[1] -= evicted
+        orders.append((self.orderLines, quantity))
+        history[1] += quantity
+
+    def rate(self, product_id):
+        """
+        :param product_id: a String
+        :return: a float, units per order line, 0 for a product with no orders yet
+        """
+        history = self.recent.get(product_id)
+        if history is None:
+            return 0.0
+        return history[1] / (self.orderLines - history[2])
+
+
+class RestockPolicy(abc.ABC):
+    """
+    Decides when and by how much a product is restocked. Every order is shown to the
+    policy through observe before its outcome is decided. A product is restocked when an
+    order finds too little stock, and also when a fulfilled order leaves it at or below
+    the policy's reorder point.
+    """
+
+    def observe(self, product_id, holiday, quantity):
+        """
+        records demand for a product.
+        :param product_id: a String
+        :param holiday: a HolidayEnum
+        :param quantity: an int
+        :return: None
+        """
+
+    def reorderPoint(self, product_id, holiday):
+        """
+        :param product_id: a String
+        :param holiday: a HolidayEnum
+        :return: an int, restock once stock falls to this level, or None to wait until an order is short
+        """
+        return None
+
+    @abc.abstractmethod
+    def restockQuantity(self, product_id, holiday, onHand, demand):
+        """
+        :param product_id: a String
+        :param holiday: a HolidayEnum
+        :param onHand: an int, units currently in stock
+        :param demand: an int, units of the order that found too little stock, 0 at the reorder point
+        :return: an int, units to add
+        """
+
+
+class FixedRestockPolicy(RestockPolicy):
+    """
+    Adds a fixed quantity whenever an order finds too little stock. With the defaults
+    this is the original behaviour of adding 100 units.
+    """
+
+    def __init__(self, quantity=RESTOCK_QUANTITY, reorderPoint=None):
+        """
+        initializer for the fixed policy.
+        :param quantity: an int or Thresholds, units added per restock
+        :param reorderPoint: an int or Thresholds, None to restock only when an order is short
+        """
+        self.quantity = Thresholds.fromConfig(quantity)
+        self.reorderPoints = Thresholds.fromConfig(reorderPoint)
+
+    def reorderPoint(self, product_id, holiday):
+        return self.reorderPoints.get(product_id, holiday)
+
+    def restockQuantity(self, product_id, holiday, onHand, demand):
+        return self.quantity.get(product_id, holiday)
+
+
+class ReorderPointPolicy(RestockPolicy):
+    """
+    (s, Q) policy. The reorder point s covers the demand expected over the lead time plus
+    safety stock, and each restock adds the economic order quantity
+    Q = sqrt(2 * demand per period * order cost / holding cost per unit per period),
+    which balances restock churn on hot SKUs against stock held for cold ones.
+    """
+
+    def __init__(self, orderCost=50, holdingCost=1, leadTime=100, safetyStock=10, period=1000,
+                 minimum=RESTOCK_QUANTITY, window=DEMAND_WINDOW):
+        """
+        initializer for the reorder point policy. Every setting is an int or a Thresholds.
+        :param orderCost: the fixed cost of one restock
+        :param holdingCost: the cost of holding one unit for one period
+        :param leadTime: order lines the reorder point should cover
+        :param safetyStock: units kept above the expected lead time demand
+        :param period: order lines per costing period
+        :param minimum: units added per restock before the product has any demand history
+        :param window: an int, recent orders used to estimate demand
+        """
+        self.orderCost = Thresholds.fromConfig(orderCost)
+        self.holdingCost = Thresholds.fromConfig(holdingCost)
+        self.leadTime = Thresholds.fromConfig(leadTime)
+        self.safetyStock = Thresholds.fromConfig(safetyStock)
+        self.period = Thresholds.fromConfig(period)
+        self.minimum = Thresholds.fromConfig(minimum)
+        self.history = DemandHistory(window)
+
+    def observe(self, product_id, holiday, quantity):
+        self.history.record(product_id, quantity)
+
+    def reorderPoint(self, product_id, holiday):
+        return (math.ceil(self.history.rate(product_id) * self.leadTime.get(product_id, holiday))
+                + self.safetyStock.get(product_id, holiday))
+
+    def restockQuantity(self, product_id, holiday, onHand, demand):
+        period_demand = self.history.rate(product_id) * self.period.get(product_id, holiday)
+        if not period_demand:
+            quantity = self.minimum.get(product_id, holiday)
+        else:
+            quantity = math.ceil(math.sqrt(2 * period_demand * self.orderCost.get(product_id, holiday)
+                                           / self.holdingCost.get(product_id, holiday)))
+        return max(quantity, demand - onHand + 1, 1)
+
+
+class DemandRatePolicy(RestockPolicy):
+    """
+    Order-up-to policy driven by recent demand: once stock falls to the demand expected
+    over the review horizon plus safety stock, it is topped up to cover the demand
+    expected over the coverage horizon.
+    """
+
+    def __init__(self, coverage=1000, review=100, safetyStock=10, minimum=RESTOCK_QUANTITY,
+                 window=DEMAND_WINDOW):
+        """
+        initializer for the demand rate policy. Every setting is an int or a Thresholds.
+        :param coverage: order lines of demand a restock should cover
+        :param review: order lines of demand the reorder point should cover
+        :param safetyStock: units kept above the expected demand
+        :param minimum: units added per restock before the product has any demand history
+        :param window: an int, recent orders used to estimate demand
+        """
+        self.coverage = Thresholds.fromConfig(coverage)
+        self.review = Thresholds.fromConfig(review)
+        self.safetyStock = Thresholds.fromConfig(safetyStock)
+        self.minimum = Thresholds.fromConfig(minimum)
+        self.history = DemandHistory(window)
+
+    def observe(self, product_id, holiday, quantity):
+        self.history.record(product_id, quantity)
+
+    def reorderPoint(self, product_id, holiday):
+        return (math.ceil(self.history.rate(product_id) * self.review.get(product_id, holiday))
+                + self.safetyStock.get(product_id, holiday))
+
+    def restockQuantity(self, product_id, holiday, onHand, demand):
+        rate = self.history.rate(product_id)
+        if not rate:
+            return max(self.minimum.get(product_id, holiday), demand - onHand + 1)
+        target = math.ceil(rate * self.coverage.get(product_id, holiday)) + self.safetyStock.get(product_id, holiday)
+        return max(target - onHand, demand - onHand + 1, 1)
+
+
+class RestockPolicyMapper:
+    """
+    class that maps policy names in a restock configuration to policy classes.
+    """
+    policy_mapper = {
+        "fixed": FixedRestockPolicy,
+        "reorder_point": ReorderPointPolicy,
+        "demand_rate": DemandRatePolicy
+    }
+
+    def get_policy(self, config):
+        """
+        builds a policy from configuration such as
+        {"policy": "reorder_point", "orderCost": 50, "leadTime": {"default": 100, "holiday": {"Christmas": 300}}}.
+        Settings are the policy's keyword arguments; "stockLevels" is ignored here.
+        :param config: a dict
+        :return: a RestockPolicy
+        """
+        config = dict(config)
+        name = config.pop("policy", "fixed")
+        config.pop("stockLevels", None)
+        policy_class = self.policy_mapper.get(name)
+        if policy_class is None:
+            raise ValueError(f"unknown restock policy {name!r}, expected one of {', '.join(self.policy_mapper)}")
+        try:
+            return policy_class(**config)
+        except TypeError as e:
+            raise ValueError(f"bad settings for restock policy {name!r}: {e}") from None
+
+    def load(self, filename):
+        """
+        reads a restock configuration from a JSON file.
+        :param filename: a String
+        :return: a tuple of (RestockPolicy, stock level Thresholds or None)
+        """
+        with open(filename) as f:
+            config = json.load(f)
+        levels = config.get("stockLevels")
+        if levels is not None:
+            levels = Thresholds.fromConfig(levels, tuple)
+        return self.get_policy(config), levels
+
+
+class OrderOutcome(enum.Enum):
+    """
+    This enum specifies what happened to an order.
+    """
+    FULFILLED = "fulfilled"
+    RESTOCKED = "restocked"
+    UNKNOWN = "unknown"
+
+
+def _decideOrder(policy, product_id, holiday, onHand, quantity):
+    """
+    decides one order, the same way whether it is applied on its own or planned in a batch:
+    fulfilled if more than the quantity is on hand and restocked otherwise, with a restock
+    after fulfilling if the stock left falls to the policy's reorder point. The order's
+    demand is recorded with the policy first.
+    :param policy: a RestockPolicy
+    :param product_id: a String
+    :param holiday: a HolidayEnum
+    :param onHand: an int, units on hand before the order
+    :param quantity: an int, units ordered
+    :return: a tuple of (OrderOutcome, units to restock after the order, 0 for none)
+    """
+    policy.observe(product_id, holiday, quantity)
+    if onHand > quantity:
+        reorder_point = policy.reorderPoint(product_id, holiday)
+        if reorder_point is not None and onHand - quantity <= reorder_point:
+            return OrderOutcome.FULFILLED, policy.restockQuantity(product_id, holiday, onHand - quantity, 0)
+        return OrderOutcome.FULFILLED, 0
+    return OrderOutcome.RESTOCKED, policy.restockQuantity(product_id, holiday, onHand, quantity)
+
+
+class OrderPlan:
+    """
+    The result of planning a batch of orders: the outcome of every order in its original
+    order as (order, product, OrderOutcome, units restocked), and the net stock changes
+    per product to apply in bulk.
+    """
+
+    def __init__(self):
+        self.outcomes = []
+        self.deductions = {}
+        self.restocks = {}
+
+    def apply(self, inventory):
+        """
+        applies the planned stock changes: each product is restocked once, with one addMany
+        per category, and all deductions go through one deductMany. Restocks are applied
+        first, so no deduction is ever cut short by a stock level the sequential run would
+        not have reached.
+        :param inventory: an Inventory or SqliteInventory
+        :return: None
+        """
+        restocks = {}
+        for product, stock_item, units in self.restocks.values():
+            restocks.setdefault(product, []).append((stock_item, units))
+        for product, items in restocks.items():
+            inventory.addMany(product, items)
+        inventory.deductMany(self.deductions.items())
+
+
+class OrderPlanner:
+    """
+    Plans a batch of orders in O(orders + products). Each product's stock is looked up
+    once and then tracked locally while walking the orders in their original order, so
+    every order gets exactly the outcome it would have had if processed one at a time.
+    """
+
+    def __init__(self, inventory, restockPolicy=None):
+        """
+        initializer for the order planner.
+        :param inventory: an Inventory or SqliteInventory, only read while planning
+        :param restockPolicy: a RestockPolicy, FixedRestockPolicy if not given
+        """
+        self.inventory = inventory
+        self.restockPolicy = restockPolicy if restockPolicy is not None else FixedRestockPolicy()
+
+    def plan(self, orders):
+        """
+        :param orders: an iterable of Orders
+        :return: an OrderPlan
+        """
+        plan = OrderPlan()
+        policy = self.restockPolicy
+        holiday_mapper = HolidayMapper()
+        # product_id -> [units on hand as the batch progresses, ProductEnum, product, HolidayEnum]
+        stock = {}
+        for item in orders:
+            state = stock.get(item.getProductID())
+            if state is None:
+                product, stock_item = holiday_mapper.build_product(item)
+                if stock_item is None:
+                    plan.outcomes.append((item, None, OrderOutcome.UNKNOWN, 0))
+                    continue
+                state = [self.inventory.checkInventory(stock_item.product_id).count, product, stock_item,
+                         PRODUCT_HOLIDAYS[type(stock_item)]]
+                stock[stock_item.product_id] = state
+            on_hand, product, stock_item, holiday = state
+            product_id = stock_item.product_id
+            quantity = int(item.getQuantity())
+            outcome, units = _decideOrder(policy, product_id, holiday, on_hand, quantity)
+            if outcome == OrderOutcome.FULFILLED:
+                on_hand -= quantity
+                plan.deductions[product_id] = plan.deductions.get(product_id, 0) + quantity
+            if units:
+                on_hand += units
+                restock = plan.restocks.get(product_id)
+                plan.restocks[product_id] = (product, stock_item, units + (restock[2] if restock else 0))
+            state[0] = on_hand
+            plan.outcomes.append((item, stock_item, outcome, units))
+        return plan
+
+
+class Storefront:
+    """
+    Entry point for the user. Maintains Orders and Inventories.
+    """
+
+    def __init__(self, orders, inventory, report=None, metrics=None, restockPolicy=None):
+        """
+        initializer for Storefront.
+        :param orders: list of Orders
+        :param inventory: Inventory
+        :param report: a TransactionReport. When given, orders are written to it as they are
+                       applied instead of being kept in orders until exit.
+        :param metrics: a Metrics to record stage timings and counters in, off if not given
+        :param restockPolicy: a RestockPolicy, adds 100 units to short products if not given
+        """
+        self.orders = orders
+        self.inventory = inventory
+        self.report = report
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.restockPolicy = restockPolicy if restockPolicy is not None else FixedRestockPolicy()
+        # the source whose orders the report was last restored and marked for, see restoreReport
+        self.reportSource = None
+
+    def userMenu(self):
+        """
+        User menu -> application entry point.
+        :return: None
+        """
+        print("welcome to the Web Store!")
+        print("_________________________")
+        try:
+            while True:
+                userInput = input(f"enter: \n"
                                   f"0 to process an order \n"
                                   f"1 to check current inventory \n"
                                   f"2 to exit \n")
@@ -657,112 +2819,231 @@ class Storefront:
         except ValueError:
             print("invalid input")
 
-    def createOrder(self):
+    def createOrder(self, orders=None, source=None, start=0):
         """
         processes online orders from specified orders file.
+        :param orders: an iterable of Orders, read from a user specified file if not given
+        :param source: a String identifying the orders file, see orderSource. When given,
+                       progress through the file is recorded with the inventory as each order
+                       is applied, and orders an earlier run already applied are skipped.
+        :param start: an int, position of the first order in the file, for files read in chunks
+        :return: None
+        """
+        print(f"Creating a new order: \n")
+        print("_________________________")
+        if orders is None:
+            with self.metrics.stage("parse"):
+                orders = OrderProcessor().processOrder()
+        with self.inventory.transaction():
+            self.applyOrders(orders, source, start)
+
+    def skipApplied(self, orders, source, start):
+        """
+        drops the leading orders of a file that an earlier run already applied.
+        :param orders: an iterable of Orders
+        :param source: a String, see createOrder
+        :param start: an int, position of the first order in the file
+        :return: a tuple of (the orders still to apply, position of the first of them)
+        """
+        if source is None:
+            return orders, start
+        if self.inventory.isComplete(source):
+            print("skipping the file, every order in it was applied by an earlier run")
+            self.metrics.count("sources_skipped")
+            return [], start
+        if source != self.reportSource:
+            self.restoreReport(source)
+        resume = self.inventory.appliedThrough(source)
+        if resume <= start:
+            return orders, start
+        orders = list(orders)
+        skipped = min(resume - start, len(orders))
+        print(f"skipping {skipped} orders already applied, up to order {self.inventory.lastApplied(source)}")
+        self.metrics.count("orders_skipped", skipped)
+        # orders applied before a crash but lost from the report's buffer are written again
+        unreported = orders[max(self.inventory.reportedThrough(source) - start, 0):skipped]
+        if unreported:
+            print(f"re-writing {len(unreported)} applied orders missing from the transaction report")
+            for item in unreported:
+                self.appendOrder(item)
+            if self.report is not None:
+                self.report.flush()
+                self.inventory.markReported(source, start + skipped, self.report.mark())
+        return orders[skipped:], start + skipped
+
+    def restoreReport(self, source):
+        """
+        before the orders of a file are reported, cuts the transaction report back to the size
+        the inventory last recorded for it if the run that recorded it crashed part way through
+        a file. Orders flushed after that record are not counted as reported, so they are
+        written again on resuming; without the cut they would be in the report twice. The
+        report is then marked for this file, so a crash before its first flush is covered too.
+        The report must not be written by anything else while a file is only part processed.
+        :param source: a String identifying the file about to be processed, see createOrder
+        :return: None
+        """
+        self.reportSource = source
+        if self.report is None:
+            return
+        self.report.flush()
+        filename, size = self.report.mark()
+        recorded = self.inventory.reportMark(filename)
+        if recorded is not None and size > recorded[0] and not self.inventory.isComplete(recorded[1]):
+            print(f"removing {size - recorded[0]} bytes of orders the transaction report holds past its "
+                  f"last recorded flush")
+            self.metrics.count("report_bytes_removed", size - recorded[0])
+            self.report.truncate(recorded[0])
+        self.inventory.markReported(source, self.inventory.reportedThrough(source), self.report.mark())
+
+    def applyOrders(self, orders, source=None, start=0):
+        """
+        applies each order against the inventory, restocking items that are short.
+        :param orders: an iterable of Orders
+        :param source: a String identifying the orders file, see createOrder
+        :param start: an int, position of the first order in the file
+        :return: None
+        """
+        metrics = self.metrics
+        policy = self.restockPolicy
+        holiday_mapper = HolidayMapper()
+        add_operations = {
+            Product.TOY: self.inventory.addToys,
+            Product.STUFFED_ANIMAL: self.inventory.addStuffedAnimals,
+            Product.CANDY: self.inventory.addCandy
+        }
+        deduct = self.inventory.deduct
+        orders, start = self.skipApplied(orders, source, start)
+        for position, item in enumerate(orders, start):
+            quantity = int(item.getQuantity())
+
+            with metrics.stage("dispatch"):
+                product, stock_item = holiday_mapper.build_product(item)
+
+            units = 0
+            # the order's stock changes and its progress mark are recovered together after a crash
+            with self.inventory.atomic():
+                if stock_item is None:
+                    outcome = OrderOutcome.UNKNOWN
+                else:
+                    product_id, holiday = stock_item.product_id, PRODUCT_HOLIDAYS[type(stock_item)]
+                    with metrics.stage("inventory"):
+                        on_hand = self.inventory.checkInventory(product_id).count
+                        outcome, units = _decideOrder(policy, product_id, holiday, on_hand, quantity)
+                        if outcome == OrderOutcome.FULFILLED:
+                            deduct(product_id, quantity)
+                        if units:
+                            add_operations[product](stock_item, units)
+                if source is not None:
+                    self.inventory.markApplied(source, position, item.getOrderNumber())
+            self.finishOrder(item, stock_item, outcome, source, units, position)
+
+    def createOrderBatch(self, orders=None, source=None, start=0):
+        """
+        processes a day's orders with the same results as createOrder, but plans the whole
+        batch first: demand is totalled per product in one pass, each product is restocked
+        and deducted once, and then every order is reported in its original order.
+        :param orders: an iterable of Orders, read from a user specified file if not given
+        :param source: a String identifying the orders file, see createOrder
+        :param start: an int, position of the first order in the file
+        :return: None
+        """
+        print(f"Creating a new order: \n")
+        print("_________________________")
+        if orders is None:
+            with self.metrics.stage("parse"):
+                orders = OrderProcessor().processOrder()
+        with self.inventory.transaction():
+            orders, start = self.skipApplied(orders, source, start)
+            # planned inside atomic() too, so no other writer can change the counts the plan read
+            with self.inventory.atomic():
+                with self.metrics.stage("plan"):
+                    plan = OrderPlanner(self.inventory, self.restockPolicy).plan(orders)
+                with self.metrics.stage("inventory"):
+                    plan.apply(self.inventory)
+                    if source is not None and plan.outcomes:
+                        self.inventory.markApplied(source, start + len(plan.outcomes) - 1,
+                                                   plan.outcomes[-1][0].getOrderNumber())
+            for position, (item, stock_item, outcome, units) in enumerate(plan.outcomes, start):
+                self.finishOrder(item, stock_item, outcome, source, units, position)
+
+    def finishOrder(self, item, stock_item, outcome, source=None, restocked=0, position=None):
+        """
+        reports the outcome of one order, counts it and writes it to the transaction report.
+        :param item: an Order
+        :param stock_item: the product the order was for, None if it could not be built
+        :param outcome: an OrderOutcome
+        :param source: a String identifying the orders file, see createOrder
+        :param restocked: an int, units the restock policy added after this order
+        :param position: an int, the order's position in the file
+        :return: None
+        """
+        metrics = self.metrics
+        metrics.count("orders")
+        if outcome == OrderOutcome.FULFILLED:
+            print("processing order...")
+            print(f"successfully processed: {item}")
+            metrics.count("orders_fulfilled")
+            metrics.countProduct(stock_item.product_id, int(item.getQuantity()))
+        elif outcome == OrderOutcome.RESTOCKED:
+            print(f"insufficient stock for: {item} ... restocking item!")
+            metrics.count("insufficient_stock")
+        else:
+            print(f"unknown holiday or item for: {item}")
+            metrics.count("orders_unknown")
+        if restocked:
+            if outcome == OrderOutcome.FULFILLED:
+                print(f"{stock_item.product_id} at its reorder point ... restocking {restocked} units")
+            metrics.count("restocks")
+            metrics.count("restocked_units", restocked)
+
+        print("writing...")
+        with metrics.stage("report"):
+            self.appendOrder(item)
+        if source is not None and self.report is not None and self.report.pending == 0:
+            self.inventory.markReported(source, position + 1, self.report.mark())
+
+    def createOrderStreaming(self, filename, chunkSize=None, source=None, processor=None, aggregate=False):
+        """
+        processes an orders file chunk by chunk so the whole workbook is never held in memory.
+        :param filename: a String
+        :param chunkSize: an int, number of orders per chunk
+        :param source: a String identifying the file, see createOrder; computed if not given
+        :param processor: the OrderProcessor to read the file with, a default one if not given
+        :param aggregate: a bool, plan each chunk as a batch with createOrderBatch
+        :return: None
+        """
+        if source is None:
+            source = orderSource(filename)
+        if processor is None:
+            processor = OrderProcessor()
+        create_order = self.createOrderBatch if aggregate else self.createOrder
+        start = 0
+        with self.inventory.transaction():
+            for chunk in processor.streamOrders(filename, chunkSize, source):
+                create_order(chunk, source, start)
+                start += len(chunk)
+
+    def completeSource(self, source):
+        """
+        records that every order in a file has been applied and reported, so the file is
+        skipped if it is ever processed again.
+        :param source: a String identifying the file, see createOrder
         :return: None
         """
-        print(f"Creating a new order: \n")
-        print("_________________________")
-        op = OrderProcessor()
-        new_list = op.processOrder()
-        for item in new_list:
-            holiday = upper(item.get_factoryMapping()[0])
-            product = item.factoryMapping[1]
-            productID = item.getProductID()
-            quantity = item.getQuantity()
-            name = item.getItemName()
-            description = item.getDescription()
-            product_details = item.getProductDetails()
-
-            holiday_map = None
-            if holiday == "HALLOWEEN":
-                holiday_map = Holiday.HALLOWEEN
-            if holiday == "CHRISTMAS":
-                holiday_map = Holiday.CHRISTMAS
-            if holiday == "EASTER":
-                holiday_map = Holiday.EASTER
-
-            holiday_factory = HolidayMapper().get_factory(holiday_map)
-
-            if product == Product.CANDY.value:
-                has_lactose = product_details.get("has_lactose")
-                has_nuts = product_details.get("has_nuts")
-                variety = product_details.get("variety")
-                pack_size = product_details.get("pack_size")
-                colour = product_details.get("colour")
-
-                candy = holiday_factory.create_candy(name=name, description=description, product_id=productID,
-                                                     has_nuts=has_nuts, has_lactose=has_lactose,
-                                                     colour=colour, variety=variety, pack_size=pack_size)
-
-                count = self.inventory.countItemsCandy(candy.name)
-
-                if count > int(quantity):
-                    print("processing order...")
-                    self.inventory.removeCandy(candy, quantity)
-                    print(f"successfully process: {item}")
-                else:
-                    self.inventory.addCandy(candy, 100)
-                    print(f"insufficient stock for: {item} ... restocking item!")
-
-            if product == "StuffedAnimal":
-                colour = product_details.get("colour")
-                stuffing = product_details.get("stuffing")
-                size = product_details.get("size")
-                fabric = product_details.get("fabric")
-
-                stuffedAnimals = holiday_factory.create_stuffed_animals(name=name, description=description,
-                                                                        product_id=productID, colour=colour,
-                                                                        stuffing=stuffing, size=size, fabric=fabric,
-                                                                        has_glow=has_glow)
-
-                count = self.inventory.countItemsAnimals(stuffedAnimals.name)
-
-                if count > int(quantity):
-                    print("processing order...")
-                    self.inventory.removeStuffedAnimal(stuffedAnimals, quantity)
-                    print(f"successfully processed : {item}")
-                else:
-                    self.inventory.addStuffedAnimals(stuffedAnimals, 100)
-                    print(f"insufficient stock for: {item} ... restocking item!")
-
-            if product == "Toy":
-                battery_operated = product_details.get("battery_operated")
-                recommended_age = product_details.get("recommended_age")
-                dimensions = product_details.get("dimensions")
-                num_rooms = product_details.get("num_rooms")
-                speed = product_details.get("speed")
-                jump_height = product_details.get("jump_height")
-                spider_type = product_details.get("spider_type")
-                number_of_sound_effects = product_details.get("num_sound")
-                colour=product_details.get("colour")
-                has_glow=product_details.get("has_glow")
-
-                toys = holiday_factory.create_toys(name=name, description=description, product_id=productID,
-                                                   has_batteries=battery_operated, min_age=recommended_age,
-                                                   dimension=dimensions, num_rooms=num_rooms, speed=speed,
-                                                   jump_height=jump_height, spider_type=spider_type,
-                                                   num_sound=number_of_sound_effects, colour=colour, has_glow=has_glow)
-                count = self.inventory.countItemsToys(toys.name)
-
-                if count > int(quantity):
-                    print("processing order...")
-                    self.inventory.removeToy(toys, quantity)
-                    print(f"successfully processed: {item}")
-                else:
-                    self.inventory.addToys(toys, 100)
-                    print(f"insufficient stock for: {item} ... restocking item!")
-            print("writing...")
-            self.appendOrder(item)
+        if self.report is not None:
+            self.report.flush()
+        self.inventory.markComplete(source)
 
     def appendOrder(self, order):
         """
-        appends order to the user order list
+        appends order to the transaction report, or to the user order list if there is none
         :param order: an Order
         :return: None
         """
-        self.orders.append(order)
+        if self.report is not None:
+            self.report.write(order)
+        else:
+            self.orders.append(order)
 
     def checkInventories(self):
         """
@@ -770,15 +3051,20 @@ class Storefront:
         :return: None
         """
         user_input = input("enter product_id")
-        self.inventory.checkInventory(user_input)
+        print(self.inventory.checkInventory(user_input))
 
-    def printDailyTransactions(self):
+    def printDailyTransactions(self, filename='dailyTransactions.txt'):
         """
-        Writes all order transactions to a txt file on program exit.
+        Writes all order transactions to a txt file on program exit. With a streaming
+        report the orders are already written, so the report is just closed.
+        :param filename: a String
         :return: None
         """
+        if self.report is not None:
+            self.report.close()
+            return
         date_time = date.today().strftime("%b-%d-%Y")
-        with open('dailyTransactions.txt', 'w') as f:
+        with open(filename, 'w') as f:
             f.write("WEB STORE - Daily Transaction Report \n")
             f.write(f"{date_time} \n")
             for order in self.orders:
@@ -787,8 +3073,12 @@ class Storefront:
 
 class Order:
     """
-    Order class defines what product the user requires from the factory.
+    Order class defines what product the user requires from the factory. The product
+    details are kept in the typed record of the product's ProductSpec, holding only the
+    fields that product uses.
     """
+    __slots__ = ('factoryMapping', 'orderNumber', 'productId', 'itemName', 'quantity', 'description',
+                 'productDetails')
 
     def __init__(self, factoryMapping, orderNumber, productId, itemName, quantity, description, productDetails):
         """
@@ -799,7 +3089,7 @@ class Order:
         :param itemName: a String
         :param quantity: an int
         :param description: a String
-        :param productDetails: a Dictionary
+        :param productDetails: a details record from ProductSpec, or a Dictionary of product details
         """
         self.factoryMapping = factoryMapping
         self.orderNumber = orderNumber
@@ -807,8 +3097,24 @@ class Order:
         self.itemName = itemName
         self.quantity = quantity
         self.description = description
+        if isinstance(productDetails, dict):
+            details = HolidayMapper().get_details(*factoryMapping)
+            productDetails = None if details is None else \
+                details._make([_cellValue(productDetails.get(field)) for field in details._fields])
         self.productDetails = productDetails
 
+    @classmethod
+    def fromRecord(cls, record):
+        """
+        builds an Order from a mapping of order sheet column names to cell values.
+        Columns that are absent or empty are treated as None.
+        :param record: a dict
+        :return: an Order
+        """
+        return cls((record.get('holiday'), record.get('item')), int(record['order_number']),
+                   record.get('product_id'), record.get('name'), int(record['quantity']),
+                   record.get('description'), record)
+
     def __str__(self):
         """
         String representation for the Order object.
@@ -817,6 +3123,14 @@ class Order:
         return (f"Order {self.orderNumber}, Item {self.factoryMapping[1]}, Product Id {self.productId},"
                 f"Name {self.itemName}, Quantity {self.quantity} \n")
 
+    def toRecord(self):
+        """
+        the order's report columns: order number, holiday, item, product id, name and quantity.
+        :return: tuple
+        """
+        return (self.orderNumber, self.factoryMapping[0], self.factoryMapping[1], self.productId,
+                self.itemName, self.quantity)
+
     def get_factoryMapping(self):
         """
         holds item and holiday objects to be mapped in the future.
@@ -864,55 +3178,948 @@ class Order:
         getter for product details.
         :return: dict of product details.
         """
+        return self.productDetails._asdict() if self.productDetails is not None else {}
+
+    def getDetails(self):
+        """
+        getter for the typed product details record.
+        :return: a ProductSpec details record, None if the holiday or item is unknown
+        """
         return self.productDetails
 
 
+ORDER_COLUMNS = ('order_number', 'holiday', 'item', 'name', 'quantity', 'product_id', 'description')
+
+PRODUCT_DETAIL_COLUMNS = ('has_batteries', 'min_age', 'dimensions', 'num_rooms', 'speed', 'jump_height',
+                          'has_glow', 'spider_type', 'num_sound', 'colour', 'has_lactose', 'has_nuts',
+                          'variety', 'pack_size', 'stuffing', 'size', 'fabric')
+
+
+ORDER_CHUNK_SIZE = 1000
+
+
+def _cellValue(value):
+    """
+    normalises an empty spreadsheet cell (None, NaN or blank text) to None.
+    :param value: a cell value
+    :return: the value, or None if the cell is empty
+    """
+    if value is None or value != value:
+        return None
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+NUMERIC_FIELDS = frozenset(('min_age', 'num_rooms', 'speed', 'jump_height', 'num_sound', 'pack_size'))
+
+FLAG_FIELDS = frozenset(('has_batteries', 'has_glow', 'has_lactose', 'has_nuts'))
+
+FLAG_VALUES = frozenset(('y', 'n', 'yes', 'no'))
+
+
+def _isBlank(value):
+    return _cellValue(value) is None
+
+
+def _number(value):
+    """
+    :param value: a cell value
+    :return: the value as a float, None if it is empty or not a number
+    """
+    if isinstance(value, bool) or _isBlank(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _perValue(values, function, missing):
+    """
+    applies a function once per distinct value rather than once per row, which is what
+    makes checking categorical columns cheap.
+    :param values: a numpy array or pandas Series of cell values
+    :param function: a function of one cell value returning a bool
+    :param missing: the result for empty (null) cells
+    :return: a numpy bool array
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    results = np.array([bool(function(value)) for value in uniques] + [missing], dtype=bool)
+    return results[codes]
+
+
+class OrderSchema:
+    """
+    The order sheet's schema, compiled once from the Holiday and Product enums and the
+    ProductSpec of every factory: which holidays and items exist, which detail fields each
+    product requires and the accepted values of enum backed and Y/N fields. A whole sheet
+    is checked a column at a time and split into accepted and rejected rows, so one bad
+    row is reported instead of failing the file.
+    """
+
+    def __init__(self, mapper=None):
+        """
+        initializer for the order schema.
+        :param mapper: a HolidayMapper, a new one if not given
+        """
+        mapper = mapper or HolidayMapper()
+        self.holidayLookup = mapper.holiday_lookup
+        self.productLookup = mapper.product_lookup
+        self.holidays = list(mapper.factories)
+        self.products = list(Product)
+        # (Holiday, Product) is coded as one int per row so per product checks are array lookups
+        self.groups = {(holiday, product): len(self.products) * holiday_index + product_index
+                       for holiday_index, holiday in enumerate(self.holidays)
+                       for product_index, product in enumerate(self.products)}
+        # (field, accepted values) -> [accepted values, None if any, and the groups requiring the field]
+        self.fields = {}
+        # (Holiday, Product) -> [(field, accepted values)], for checking one record at a time
+        self.productFields = {}
+        for (holiday, product), group in self.groups.items():
+            spec = mapper.get_factory(holiday).get_spec(product)
+            for field in spec.details._fields:
+                accepted = spec.choices.get(field, FLAG_VALUES if field in FLAG_FIELDS else None)
+                check = self.fields.setdefault((field, accepted), [accepted, []])
+                check[1].append(group)
+                self.productFields.setdefault((holiday, product), []).append((field, accepted))
+
+    def checkRecord(self, record):
+        """
+        checks a single order record, e.g. one posted to the intake service, by the same
+        rules validate applies to a whole sheet.
+        :param record: a dict of order sheet column names to values
+        :return: a list of Strings, the reasons the record is rejected, empty if it is accepted
+        """
+        reasons = []
+        holiday = self.holidayLookup.get(record.get('holiday').strip().lower()) \
+            if isinstance(record.get('holiday'), str) else None
+        product = self.productLookup.get(record.get('item').strip().lower()) \
+            if isinstance(record.get('item'), str) else None
+        if holiday not in self.holidays:
+            reasons.append(f"unknown holiday {record.get('holiday')}")
+        if product is None:
+            reasons.append(f"unknown item {record.get('item')}")
+        order_number = _number(record.get('order_number'))
+        if order_number is None or order_number % 1:
+            reasons.append(f"invalid order_number {record.get('order_number')}")
+        quantity = _number(record.get('quantity'))
+        if quantity is None or quantity % 1 or quantity < 1:
+            reasons.append(f"invalid quantity {record.get('quantity')}")
+        for column in ('name', 'product_id'):
+            if _isBlank(record.get(column)):
+                reasons.append(f"missing {column}")
+        for field, accepted in self.productFields.get((holiday, product), ()):
+            value = record.get(field)
+            if _isBlank(value):
+                reasons.append(f"missing {field}")
+            elif accepted is not None:
+                if not isinstance(value, str) or value.strip().lower() not in accepted:
+                    reasons.append(f"invalid {field} {value}")
+            elif field in NUMERIC_FIELDS and _number(value) is None:
+                reasons.append(f"invalid {field} {value}")
+        return reasons
+
+    def validate(self, df):
+        """
+        checks every order row and coerces order_number, quantity and numeric detail
+        columns to numbers.
+        :param df: a pandas DataFrame laid out like the order sheet
+        :return: a tuple of (accepted, rejected) DataFrames. rejected keeps the rows as read
+                 with a "row" column (the sheet row, counting the header as row 1) and a
+                 "reason" column listing every problem found.
+        """
+        import numpy as np
+        import pandas as pd
+
+        missing = [column for column in ORDER_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"order sheet is missing columns: {', '.join(missing)}")
+        # a row with detail cells but no order is reported rather than dropped
+        df = df.dropna(how="all", subset=list(ORDER_COLUMNS))
+        reasons = np.full(len(df), "", dtype=object)
+
+        def reject(rows, message, column=None):
+            if len(rows):
+                if column is None:
+                    reasons[rows] += f"{message}; "
+                else:
+                    reasons[rows] += np.array([f"{message} {value}; " for value in df[column].to_numpy()[rows]],
+                                              dtype=object)
+
+        holiday_codes = self.categoryCodes(df['holiday'], self.holidayLookup, self.holidays)
+        item_codes = self.categoryCodes(df['item'], self.productLookup, self.products)
+        reject(np.flatnonzero(holiday_codes < 0), "unknown holiday", 'holiday')
+        reject(np.flatnonzero(item_codes < 0), "unknown item", 'item')
+        groups = np.where((holiday_codes < 0) | (item_codes < 0), -1,
+                          holiday_codes * len(self.products) + item_codes)
+        group_rows = {group: np.flatnonzero(groups == group) for group in self.groups.values()}
+
+        order_numbers = pd.to_numeric(df['order_number'], errors='coerce')
+        reject(np.flatnonzero(order_numbers.isna() | (order_numbers % 1 != 0)), "invalid order_number",
+               'order_number')
+        quantities = pd.to_numeric(df['quantity'], errors='coerce')
+        reject(np.flatnonzero(quantities.isna() | (quantities % 1 != 0) | (quantities < 1)), "invalid quantity",
+               'quantity')
+        for column in ('name', 'product_id'):
+            reject(np.flatnonzero(_perValue(df[column], _isBlank, True)), f"missing {column}")
+
+        # each detail field is only checked on the rows of products that have it
+        coerced = {}
+        for (field, _), (accepted, group_codes) in self.fields.items():
+            rows = np.concatenate([group_rows[group] for group in group_codes])
+            if not len(rows):
+                continue
+            if field not in df.columns:
+                reject(rows, f"missing {field}")
+                continue
+            values = df[field].to_numpy()[rows]
+            blank = _perValue(values, _isBlank, True)
+            reject(rows[blank], f"missing {field}")
+            if accepted is not None:
+                valid = _perValue(values, lambda value: isinstance(value, str) and value.strip().lower() in accepted,
+                                  False)
+                reject(rows[~blank & ~valid], f"invalid {field}", field)
+            elif field in NUMERIC_FIELDS:
+                numbers = pd.to_numeric(values, errors='coerce')
+                reject(rows[~blank & np.isnan(numbers)], f"invalid {field}", field)
+                if df[field].dtype == object:
+                    coerced[field] = pd.to_numeric(df[field], errors='coerce')
+
+        ok = reasons == ""
+        accepted = df[ok].assign(order_number=order_numbers[ok].astype('int64'),
+                                 quantity=quantities[ok].astype('int64'),
+                                 **{field: numbers[ok] for field, numbers in coerced.items()})
+        rejected = df[~ok]
+        rejected.insert(0, 'reason', [reason[:-2] for reason in reasons[~ok]])
+        rejected.insert(0, 'row', rejected.index + 2)
+        return accepted, rejected
+
+    @staticmethod
+    def categoryCodes(column, lookup, members):
+        """
+        :param column: a pandas Series of category names as spelled in the sheet
+        :param lookup: a dict of lowercase name to enum member
+        :param members: a list of the enum members to code
+        :return: a numpy int array of each row's member position, -1 if unknown
+        """
+        import numpy as np
+        import pandas as pd
+
+        positions = {name: members.index(member) for name, member in lookup.items() if member in members}
+        codes, uniques = pd.factorize(column)
+        mapping = np.array([positions.get(value.strip().lower(), -1) if isinstance(value, str) else -1
+                            for value in uniques] + [-1], dtype=np.int64)
+        return mapping[codes]
+
+
+ORDER_SCHEMA = OrderSchema()
+
+
+class OrderSource(abc.ABC):
+    """
+    The base order source. Each source reads one file format into pandas DataFrames
+    laid out like the order sheet, so every format produces the same Order stream.
+    """
+
+    @abc.abstractmethod
+    def readFrame(self, filename):
+        """
+        reads a whole order file.
+        :param filename: a String
+        :return: a pandas DataFrame
+        """
+        pass
+
+    @abc.abstractmethod
+    def writeFrame(self, df, filename):
+        """
+        writes orders to a file in this source's format.
+        :param df: a pandas DataFrame
+        :param filename: a String
+        :return: None
+        """
+        pass
+
+    def readFrames(self, filename, chunkSize):
+        """
+        reads an order file a chunk at a time. Sources that cannot stream read the whole file.
+        :param filename: a String
+        :param chunkSize: an int, number of rows per chunk
+        :return: a generator of pandas DataFrames
+        """
+        yield self.readFrame(filename)
+
+    def writeFrames(self, frames, filename):
+        """
+        writes a sequence of DataFrame chunks to a file in this source's format.
+        :param frames: an iterable of pandas DataFrames
+        :param filename: a String
+        :return: None
+        """
+        import pandas as pd
+
+        self.writeFrame(pd.concat(list(frames), ignore_index=True), filename)
+
+
+class ExcelOrderSource(OrderSource):
+    """
+    Reads the website's xlsx export. Streaming uses openpyxl's read-only mode.
+    """
+
+    def readFrame(self, filename):
+        import pandas as pd
+
+        return pd.read_excel(filename, sheet_name="Sheet1")
+
+    def writeFrame(self, df, filename):
+        df.to_excel(filename, sheet_name="Sheet1", index=False)
+
+    def readFrames(self, filename, chunkSize):
+        import openpyxl
+        import pandas as pd
+
+        workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+        try:
+            rows = workbook["Sheet1"].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            # frames are indexed by row number below the header, as read_excel does
+            chunk, index = [], []
+            for position, row in enumerate(rows):
+                if all(_cellValue(value) is None for value in row):
+                    continue
+                chunk.append(row)
+                index.append(position)
+                if len(chunk) >= chunkSize:
+                    yield pd.DataFrame.from_records(chunk, columns=header, index=index)
+                    chunk, index = [], []
+            if chunk:
+                yield pd.DataFrame.from_records(chunk, columns=header, index=index)
+        finally:
+            workbook.close()
+
+
+class CsvOrderSource(OrderSource):
+    """
+    Reads and writes orders as CSV.
+    """
+
+    def readFrame(self, filename):
+        import pandas as pd
+
+        return pd.read_csv(filename)
+
+    def writeFrame(self, df, filename):
+        df.to_csv(filename, index=False)
+
+    def readFrames(self, filename, chunkSize):
+        import pandas as pd
+
+        with pd.read_csv(filename, chunksize=chunkSize) as reader:
+            yield from reader
+
+    def writeFrames(self, frames, filename):
+        header = True
+        with open(filename, 'w', newline='') as f:
+            for df in frames:
+                df.to_csv(f, index=False, header=header)
+                header = False
+
+
+def _arrowTables(frames):
+    """
+    converts DataFrame chunks to Arrow tables for a file written a chunk at a time, which
+    holds one schema for every chunk. The schema is the first chunk's, except that numeric
+    product details read as integers are widened to float, as a later chunk with a blank
+    cell reads them, and columns the first chunk leaves blank are typed from the order
+    sheet: float for numeric product details, text otherwise.
+    :param frames: an iterable of pandas DataFrames
+    :return: a generator of pyarrow Tables
+    """
+    import pyarrow
+
+    schema = None
+    for df in frames:
+        if schema is None:
+            fields = []
+            for field in pyarrow.Schema.from_pandas(df, preserve_index=False).remove_metadata():
+                numeric = field.name in NUMERIC_FIELDS
+                if df[field.name].isna().all():
+                    field = field.with_type(pyarrow.float64() if numeric else pyarrow.string())
+                elif numeric and pyarrow.types.is_integer(field.type):
+                    field = field.with_type(pyarrow.float64())
+                fields.append(field)
+            schema = pyarrow.schema(fields)
+        yield pyarrow.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+class ParquetOrderSource(OrderSource):
+    """
+    Reads and writes orders as Parquet (Arrow). Requires pyarrow. Chunks are written as
+    row groups one at a time, so a converted file is never held in memory whole.
+    """
+
+    def readFrame(self, filename):
+        import pandas as pd
+
+        return pd.read_parquet(filename)
+
+    def writeFrame(self, df, filename):
+        df.to_parquet(filename, index=False)
+
+    def readFrames(self, filename, chunkSize):
+        import pyarrow.parquet
+
+        start = 0
+        for batch in pyarrow.parquet.ParquetFile(filename).iter_batches(batch_size=chunkSize):
+            df = batch.to_pandas()
+            df.index += start
+            start += len(df)
+            yield df
+
+    def writeFrames(self, frames, filename):
+        import pyarrow.parquet
+
+        writer = None
+        try:
+            for table in _arrowTables(frames):
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(filename, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            import pandas as pd
+
+            self.writeFrame(pd.DataFrame(), filename)
+
+
+class FeatherOrderSource(OrderSource):
+    """
+    Reads and writes orders as Feather, the Arrow IPC file format. Requires pyarrow.
+    Chunks are written as record batches one at a time, compressed like to_feather.
+    """
+
+    def readFrame(self, filename):
+        import pandas as pd
+
+        return pd.read_feather(filename)
+
+    def writeFrame(self, df, filename):
+        df.reset_index(drop=True).to_feather(filename)
+
+    def readFrames(self, filename, chunkSize):
+        import pyarrow.feather
+
+        start = 0
+        for batch in pyarrow.feather.read_table(filename, memory_map=True).to_batches(max_chunksize=chunkSize):
+            df = batch.to_pandas()
+            df.index += start
+            start += len(df)
+            yield df
+
+    def writeFrames(self, frames, filename):
+        import pyarrow.ipc
+
+        writer = None
+        try:
+            for table in _arrowTables(frames):
+                if writer is None:
+                    writer = pyarrow.ipc.new_file(filename, table.schema,
+                                                  options=pyarrow.ipc.IpcWriteOptions(compression="lz4"))
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            import pandas as pd
+
+            self.writeFrame(pd.DataFrame(), filename)
+
+
+class JsonLinesOrderSource(OrderSource):
+    """
+    Reads and writes orders as JSON Lines, one order object per line.
+    """
+
+    def readFrame(self, filename):
+        import pandas as pd
+
+        return pd.read_json(filename, lines=True, dtype=False)
+
+    def writeFrame(self, df, filename):
+        df.to_json(filename, orient="records", lines=True)
+
+    def readFrames(self, filename, chunkSize):
+        import pandas as pd
+
+        with pd.read_json(filename, lines=True, dtype=False, chunksize=chunkSize) as reader:
+            yield from reader
+
+    def writeFrames(self, frames, filename):
+        with open(filename, 'w') as f:
+            for df in frames:
+                df.to_json(f, orient="records", lines=True)
+
+
+class OrderSourceMapper:
+    """
+    class that maps order file extensions to order sources.
+    """
+    source_mapper = {
+        ".xlsx": ExcelOrderSource,
+        ".csv": CsvOrderSource,
+        ".parquet": ParquetOrderSource,
+        ".pq": ParquetOrderSource,
+        ".feather": FeatherOrderSource,
+        ".arrow": FeatherOrderSource,
+        ".jsonl": JsonLinesOrderSource,
+        ".ndjson": JsonLinesOrderSource
+    }
+
+    def get_source(self, filename) -> OrderSource:
+        """
+        Retrieves the order source for a file based on its extension
+        :param filename: a String
+        :return: an OrderSource
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        source_class = self.source_mapper.get(extension)
+        if source_class is None:
+            raise ValueError(f"unsupported order file type: {filename}")
+        return source_class()
+
+
+def _readOrderFile(filename, cache=None, rejects=None, source=None):
+    """
+    reads a whole order file. Module level so it can run in a worker process; the orders
+    are sent back column-wise, which pickles far faster than the Order objects themselves.
+    :param filename: a String
+    :param cache: a ParseCache, or None
+    :param rejects: a String, the directory rejected rows are reported in, or None
+    :param source: a String, the file's orderSource if already known
+    :return: a dict of the orders sorted by order number, see ParseCache.columnsFromOrders
+    """
+    orders = OrderProcessor(cache, rejects).processOrder(filename, source)
+    orders.sort(key=Order.getOrderNumber)
+    return ParseCache.columnsFromOrders(orders)
+
+
+def orderSource(filename):
+    """
+    identifies an order file by a hash of its content rather than its name, since each
+    day's export usually reuses the same name and restarts its order numbers.
+    :param filename: a String
+    :return: a String
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+PARSE_CACHE_VERSION = 2
+
+PARSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed order files keyed by a hash of the file's content, so a file
+    that changes is simply a different entry. Orders are stored column-wise like inventory
+    snapshots, which loads far faster than re-reading the sheet. Entries are touched when
+    read and the least recently used ones are evicted once the cache grows past maxBytes.
+    """
+
+    def __init__(self, directory, maxBytes=PARSE_CACHE_MAX_BYTES):
+        """
+        initializer for the parse cache.
+        :param directory: a String, created if missing
+        :param maxBytes: an int, total size of entries to keep
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, filename):
+        """
+        :param filename: a String
+        :return: a String, the hash of the file's content, the same as its orderSource, so
+                 a caller that already has that can pass it to get and put instead
+        """
+        return orderSource(filename)
+
+    def entryFilename(self, key):
+        return os.path.join(self.directory, f"{key}.orders")
+
+    def get(self, filename, key=None):
+        """
+        :param filename: a String
+        :param key: a String, the file's key if already computed, see key
+        :return: list of orders parsed from the file's current content, None if not cached
+        """
+        entry = self.entryFilename(key if key is not None else self.key(filename))
+        try:
+            with open(entry, 'rb') as f:
+                cached = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.discard(entry)
+            return None
+        if cached.get('version') != PARSE_CACHE_VERSION:
+            self.discard(entry)
+            return None
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return self.ordersFromColumns(cached)
+
+    def put(self, filename, orders, key=None):
+        """
+        caches the orders parsed from a file, then evicts old entries if over the size limit.
+        :param filename: a String
+        :param orders: list of orders
+        :param key: a String, the file's key if already computed, see key
+        :return: None
+        """
+        entry = self.entryFilename(key if key is not None else self.key(filename))
+        temp_filename = f"{entry}.{os.getpid()}.tmp"
+        with open(temp_filename, 'wb') as f:
+            pickle.dump(self.columnsFromOrders(orders), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, entry)
+        self.evict()
+
+    def evict(self):
+        """
+        deletes the least recently used entries until the cache fits in maxBytes.
+        :return: None
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".orders"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            self.discard(os.path.join(self.directory, name))
+            total -= size
+
+    def discard(self, entry):
+        try:
+            os.remove(entry)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """
+        deletes every entry.
+        :return: None
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith(".orders"):
+                self.discard(os.path.join(self.directory, name))
+
+    @staticmethod
+    def columnsFromOrders(orders):
+        """
+        :param orders: list of orders
+        :return: a dict of order columns; details are kept as plain tuples with the index
+                 of their record type per order, 255 when there are none
+        """
+        detail_types = []
+        type_indexes = {}
+        kinds = bytearray()
+        details = []
+        for order in orders:
+            record = order.getDetails()
+            if record is None:
+                kinds.append(255)
+                details.append(None)
+                continue
+            kind = type_indexes.get(type(record))
+            if kind is None:
+                kind = type_indexes[type(record)] = len(detail_types)
+                detail_types.append(type(record).__name__)
+            kinds.append(kind)
+            details.append(tuple(record))
+        return {
+            'version': PARSE_CACHE_VERSION,
+            'columns': [[order.getOrderNumber() for order in orders],
+                        [order.get_factoryMapping()[0] for order in orders],
+                        [order.get_factoryMapping()[1] for order in orders],
+                        [order.getProductID() for order in orders],
+                        [order.getItemName() for order in orders],
+                        [order.getQuantity() for order in orders],
+                        [order.getDescription() for order in orders]],
+            'detailTypes': detail_types,
+            'kinds': bytes(kinds),
+            'details': details
+        }
+
+    @staticmethod
+    def ordersFromColumns(cached):
+        """
+        :param cached: a dict made by columnsFromOrders
+        :return: list of orders
+        """
+        records = {spec.details.__name__: spec.details for spec in PRODUCT_SPECS.values()}
+        detail_types = [records[name] for name in cached['detailTypes']]
+        with _gcDisabled():
+            return [Order((holiday, item), order_number, product_id, name, quantity, description,
+                          None if values is None else tuple.__new__(detail_types[kind], values))
+                    for order_number, holiday, item, product_id, name, quantity, description, kind, values
+                    in zip(*cached['columns'], cached['kinds'], cached['details'])]
+
+
+REJECTION_COLUMNS = ('row', 'reason') + ORDER_COLUMNS + PRODUCT_DETAIL_COLUMNS
+
+
+class RejectionReport:
+    """
+    CSV report of the rows an OrderSchema rejected from one order file, with the reason for
+    each. The report is named after the file and a hash of its content and is written to a
+    temporary file first, so re-parsing the same file replaces its report rather than
+    adding to it, and a parse that fails part way leaves the previous report in place.
+    """
+
+    def __init__(self, directory, filename, source=None):
+        """
+        initializer for the rejection report.
+        :param directory: a String, created if missing
+        :param filename: a String, the order file being parsed
+        :param source: a String, the file's orderSource, computed if not given
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        if source is None:
+            source = orderSource(filename)
+        self.filename = os.path.join(directory, f"{stem}.{source[:12]}.rejected.csv")
+        self.tempFilename = f"{self.filename}.{os.getpid()}.tmp"
+        self.file = open(self.tempFilename, 'w', newline='')
+        self.count = 0
+
+    def write(self, rejected):
+        """
+        :param rejected: a DataFrame of rejected rows from OrderSchema.validate
+        :return: None
+        """
+        rejected.reindex(columns=list(REJECTION_COLUMNS)).to_csv(self.file, index=False, header=not self.count)
+        self.count += len(rejected)
+
+    def close(self):
+        """
+        publishes the report, or removes the file's old report if nothing was rejected.
+        :return: None
+        """
+        self.file.close()
+        if self.count:
+            os.replace(self.tempFilename, self.filename)
+        else:
+            os.remove(self.tempFilename)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.filename)
+
+    def discard(self):
+        self.file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.tempFilename)
+
+
 class OrderProcessor:
     """
     OrderProcessor class that connects Orders to the factory.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, cache=None, rejects=None, schema=ORDER_SCHEMA):
+        """
+        initializer for the order processor.
+        :param cache: a ParseCache to reuse orders parsed from identical files, or None
+        :param rejects: a String, the directory to write a RejectionReport per file to, or None
+                        to only print how many rows were rejected
+        :param schema: the OrderSchema rows are checked against, None to trust every row
+        """
+        self.cache = cache
+        self.rejects = rejects
+        self.schema = schema
 
-    def processOrder(self):
+    def processOrder(self, filename=None, source=None):
         """
         Function that accesses orders from user inputted file using pandas.
+        :param filename: a String, prompted for if not given
+        :param source: a String, the file's orderSource if the caller already has it, so the
+                       file is hashed once for the parse cache and rejection report
+        :return: list of orders
+        """
+        if filename is None:
+            filename = input("enter filename: \n")
+        reader = OrderSourceMapper().get_source(filename)
+        if self.cache is not None:
+            if source is None:
+                source = self.cache.key(filename)
+            orders = self.cache.get(filename, source)
+            if orders is not None:
+                return orders
+        df = reader.readFrame(filename)
+        with self.rejections(filename, source) as onReject:
+            orders = self.ordersFromFrame(df, onReject)
+        if self.cache is not None:
+            self.cache.put(filename, orders, source)
+        return orders
+
+    def ordersFromFrame(self, df, onReject=None):
+        """
+        Builds orders from a DataFrame a whole column at a time rather than row by row.
+        Rows failing the schema are left out. Missing product detail columns are treated
+        as empty and empty cells become None.
+        :param df: a pandas DataFrame with one order per row
+        :param onReject: a function called with a DataFrame of the rejected rows, if any
         :return: list of orders
         """
-        filename = input("enter filename: \n")
-        df_sheet_all = pd.read_excel(filename, sheet_name="Sheet1")
-        order_list = []
-        for i in range(0, len(df_sheet_all) - 1):
-            order = df_sheet_all.loc[i]
-            order_number = order['order_number']
-            holiday = order['holiday']
-            item = order['item']
-            name = order['name']
-            quantity = order['quantity']
-            product_id = order['product_id']
-            description = order['description']
-            factoryMapping = (holiday, item)
-            product_details = {
-                'has_batteries': order['has_batteries'],
-                'min_age': order['min_age'],
-                'dimensions': order['dimensions'],
-                'num_rooms': order['num_rooms'],
-                'speed': order['speed'],
-                'jump_height': order['jump_height'],
-                'has_glow': order['has_glow'],
-                'spider_type': order['spider_type'],
-                'num_sound': order['num_sound'],
-                'colour': order['colour'],
-                'has_lactose': order['has_lactose'],
-                'has_nuts': order['has_nuts'],
-                'variety': order['variety'],
-                'pack_size': order['pack_size'],
-                'stuffing': order['stuffing'],
-                'size': order['size'],
-                'fabric': order['fabric']
-            }
-            order_list.append(Order(factoryMapping, order_number,
-                                    product_id, name, quantity, description, product_details))
-
-        return order_list
+        if self.schema is not None:
+            df, rejected = self.schema.validate(df)
+            if len(rejected) and onReject is not None:
+                onReject(rejected)
+        else:
+            missing = [column for column in ORDER_COLUMNS if column not in df.columns]
+            if missing:
+                raise ValueError(f"order sheet is missing columns: {', '.join(missing)}")
+            df = df.dropna(how="all")
+
+        order_numbers = df['order_number'].astype(int).tolist()
+        quantities = df['quantity'].astype(int).tolist()
+        holidays = df['holiday'].tolist()
+        items = df['item'].tolist()
+        names = df['name'].tolist()
+        product_ids = df['product_id'].tolist()
+        descriptions = df['description'].tolist()
+
+        details = df.reindex(columns=list(PRODUCT_DETAIL_COLUMNS))
+        details = zip(*[details[column].astype(object).where(details[column].notna(), None).tolist()
+                        for column in PRODUCT_DETAIL_COLUMNS])
+
+        # (holiday, item) as spelled in the sheet -> a function picking that product's details out of a row
+        holiday_mapper = HolidayMapper()
+        detail_makers = {}
+
+        def detailMaker(holiday, item):
+            details_type = holiday_mapper.get_details(holiday, item)
+            if details_type is None:
+                return lambda row: None
+            getter = operator.itemgetter(*[PRODUCT_DETAIL_COLUMNS.index(field) for field in details_type._fields])
+            return lambda row: tuple.__new__(details_type, getter(row))
+
+        with _gcDisabled():
+            orders = []
+            for order_number, holiday, item, name, quantity, product_id, description, product_details \
+                    in zip(order_numbers, holidays, items, names, quantities, product_ids, descriptions, details):
+                maker = detail_makers.get((holiday, item))
+                if maker is None:
+                    maker = detail_makers[(holiday, item)] = detailMaker(holiday, item)
+                orders.append(Order((holiday, item), order_number, product_id, name, quantity, description,
+                                    maker(product_details)))
+            return orders
+
+    def streamOrders(self, filename, chunkSize=None, source=None):
+        """
+        Reads orders a chunk at a time so peak memory is bounded by the chunk size
+        rather than the file size. xlsx files are read in openpyxl read-only mode.
+        :param filename: a String
+        :param chunkSize: an int, number of orders per chunk
+        :param source: a String, the file's orderSource if already known
+        :return: a generator of lists of orders
+        """
+        reader = OrderSourceMapper().get_source(filename)
+        with self.rejections(filename, source) as onReject:
+            for df in reader.readFrames(filename, chunkSize or ORDER_CHUNK_SIZE):
+                orders = self.ordersFromFrame(df, onReject)
+                if orders:
+                    yield orders
+
+    @contextlib.contextmanager
+    def rejections(self, filename, source=None):
+        """
+        collects the rows rejected while parsing a file into its RejectionReport, then
+        prints how many there were.
+        :param filename: a String
+        :param source: a String, the file's orderSource if already known
+        :return: a context manager giving a function to call with each DataFrame of rejected rows
+        """
+        report = RejectionReport(self.rejects, filename, source) if self.rejects else None
+        count = 0
+
+        def onReject(rejected):
+            nonlocal count
+            count += len(rejected)
+            if report is not None:
+                report.write(rejected)
+
+        try:
+            yield onReject
+        except BaseException:
+            if report is not None:
+                report.discard()
+            raise
+        if report is not None:
+            report.close()
+        if count:
+            print(f"rejected {count} orders in {filename}" + (f", see {report.filename}" if report else ""))
+
+    def processFiles(self, filenames, workers=None, onError=None, sources=None):
+        """
+        Parses several order files in parallel worker processes and merges their orders
+        into a single stream in order number order. Orders with the same number keep
+        the order of the files they came from, so feeding the stream into one Inventory
+        gives the same stock deductions on every run.
+        :param filenames: a list of Strings
+        :param workers: an int, number of worker processes, defaults to the number of cores
+        :param onError: a function called with (filename, exception) for files that fail to
+                        parse; those files are skipped. If not given the error is raised.
+        :param sources: dict of filename to its orderSource, for files already hashed
+        :return: an iterator of orders
+        """
+        sources = sources or {}
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_readOrderFile, filename, self.cache, self.rejects, sources.get(filename))
+                       for filename in filenames]
+            streams = []
+            for filename, future in zip(filenames, futures):
+                try:
+                    streams.append(ParseCache.ordersFromColumns(future.result()))
+                except Exception as e:
+                    if onError is None:
+                        raise
+                    onError(filename, e)
+        return heapq.merge(*streams, key=Order.getOrderNumber)
+
+    def convertOrders(self, source_filename, target_filename, chunkSize=None):
+        """
+        Converts an order file between formats, e.g. the nightly xlsx export to Parquet,
+        so it can be re-processed cheaply. The file is copied a chunk at a time where the
+        target format allows it.
+        :param source_filename: a String
+        :param target_filename: a String
+        :param chunkSize: an int, number of rows per chunk
+        :return: None
+        """
+        mapper = OrderSourceMapper()
+        source = mapper.get_source(source_filename)
+        target = mapper.get_source(target_filename)
+        target.writeFrames(source.readFrames(source_filename, chunkSize or ORDER_CHUNK_SIZE), target_filename)
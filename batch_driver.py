@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import sys
+
+from SupplyChain import (Inventory, Metrics, OrderProcessor, ParseCache, ReportMapper, RestockPolicyMapper,
+                         SqliteInventory, Storefront, orderSource, profiled)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_NO_INPUT = 2
+
+
+def expandPatterns(patterns):
+    """
+    expands glob patterns into a sorted list of order files, keeping plain filenames as given.
+    :param patterns: a list of Strings
+    :return: a list of Strings
+    """
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        filenames.extend(matches if matches else ([pattern] if not glob.has_magic(pattern) else []))
+    return filenames
+
+
+def combinedSource(sources):
+    """
+    identifies a set of order files merged into one stream, in the order they are merged.
+    :param sources: a list of Strings from orderSource
+    :return: a String
+    """
+    return hashlib.blake2b("+".join(sources).encode(), digest_size=20).hexdigest()
+
+
+def unfinishedMerge(inventory, source, merged=None):
+    """
+    finds the merged stream an earlier -j run applied part of a file in without finishing.
+    Progress through a merged stream is recorded for the stream as a whole, not per file, so
+    its files can only be resumed by merging the same files again; applied any other way,
+    the orders that run already applied would be applied twice.
+    :param inventory: an Inventory or SqliteInventory
+    :param source: a String from orderSource
+    :param merged: a String from combinedSource, the stream the file is about to be merged into
+    :return: a String identifying the earlier stream, None if the file can be applied
+    """
+    earlier = inventory.mergedInto(source)
+    if earlier is None or earlier == merged or not inventory.appliedThrough(earlier):
+        return None
+    return earlier
+
+
+MERGE_CHANGED = ("an earlier run merged it with other files (-j) and stopped part way; progress is recorded "
+                 "for that merged stream only, so resume it with -j and the same files")
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description="Process web order files without the interactive menu.")
+    parser.add_argument("orders", nargs="+", help="order files or glob patterns, e.g. 'exports/orders-*.xlsx'")
+    parser.add_argument("-i", "--inventory", default="inventory.snapshot",
+                        help="inventory snapshot to load before and save after processing; "
+                             "stock changes are logged to <inventory>.wal until the run completes")
+    parser.add_argument("--sync", action="store_true", help="fsync the stock log after every change and the report on every flush")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory",
+                        help="keep stock in memory with a snapshot, or in an SQLite database at --inventory")
+    parser.add_argument("-o", "--output", default="dailyTransactions.txt",
+                        help="transaction report to append to as orders are applied (.txt, .csv or .jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream each file in chunks of this many orders")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="parse files in this many worker processes and merge them by order number "
+                             "(not with --chunk-size); a run stopped part way resumes only with the same files")
+    parser.add_argument("--parse-cache", default=None,
+                        help="directory caching parsed order files by content hash, so re-running an "
+                             "unchanged file skips parsing (not with --chunk-size)")
+    parser.add_argument("--parse-cache-size", type=int, default=512, help="parse cache size limit in MiB")
+    parser.add_argument("--rejects", default=None,
+                        help="directory to write the rows rejected from each file to, with the reason for each, "
+                             "as <file>.<hash>.rejected.csv")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="plan each file, or each chunk with --chunk-size, as a batch: total demand per "
+                             "product, then restock and deduct each product once")
+    parser.add_argument("--restock-policy", default=None,
+                        help="JSON restock configuration: the policy, its settings per SKU or holiday, "
+                             "and optional stockLevels for stock checks; adds 100 units to short products if not given")
+    parser.add_argument("--metrics", action="store_true", help="print stage timings and counters when done")
+    parser.add_argument("--prometheus", default=None, help="write metrics to this Prometheus text file")
+    parser.add_argument("--profile", default=None, help="run under cProfile and save the stats to this file")
+    args = parser.parse_args(argv)
+    if args.chunk_size and args.jobs:
+        parser.error("--chunk-size streams one file at a time and cannot be combined with -j/--jobs")
+    if args.chunk_size and args.parse_cache:
+        parser.error("--parse-cache caches whole parsed files and cannot be combined with --chunk-size")
+    return args
+
+
+def main(argv=None):
+    """
+    Batch entry point: processes every order file end to end and exits with a status code.
+    :param argv: a list of Strings, defaults to sys.argv
+    :return: an int exit status
+    """
+    args = parseArgs(argv)
+    filenames = expandPatterns(args.orders)
+    if not filenames:
+        print("no order files matched", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    metrics = Metrics() if args.metrics or args.prometheus else None
+    with profiled(args.profile) if args.profile else contextlib.nullcontext():
+        status = run(args, filenames, metrics)
+    if args.metrics:
+        print(metrics.summary())
+    if args.prometheus:
+        metrics.writePrometheus(args.prometheus)
+    return status
+
+
+def run(args, filenames, metrics):
+    """
+    processes the order files against the inventory.
+    :param args: parsed arguments
+    :param filenames: a list of Strings
+    :param metrics: a Metrics, or None
+    :return: an int exit status
+    """
+    if args.backend == "sqlite":
+        inventory = SqliteInventory(args.inventory)
+    else:
+        inventory = Inventory.open(args.inventory, sync=args.sync)
+    restock_policy = None
+    if args.restock_policy:
+        restock_policy, stock_levels = RestockPolicyMapper().load(args.restock_policy)
+        if stock_levels is not None:
+            inventory.stockLevels = stock_levels
+    storefront = Storefront([], inventory, ReportMapper().get_report(args.output, sync=args.sync), metrics,
+                            restock_policy)
+
+    cache = ParseCache(args.parse_cache, args.parse_cache_size * 1024 * 1024) if args.parse_cache else None
+    processor = OrderProcessor(cache, args.rejects)
+    failed = []
+
+    def onError(filename, e):
+        print(f"failed to process {filename}: {e}", file=sys.stderr)
+        failed.append(filename)
+
+    sources = {}
+    for filename in filenames:
+        try:
+            source = orderSource(filename)
+        except OSError as e:
+            onError(filename, e)
+            continue
+        if inventory.isComplete(source):
+            print(f"skipping {filename}: already applied")
+            storefront.metrics.count("files_skipped")
+        else:
+            sources[filename] = source
+    pending = list(sources)
+
+    if args.jobs and pending:
+        print(f"processing {len(pending)} files with {args.jobs} workers")
+        try:
+            with storefront.metrics.stage("parse"):
+                orders = processor.processFiles(pending, args.jobs, onError, sources)
+            merged = [filename for filename in pending if filename not in failed]
+            # the merged stream is tracked as one source, so a crashed run resumes only with the same files
+            source = combinedSource([sources[filename] for filename in merged])
+            changed = [filename for filename in merged if unfinishedMerge(inventory, sources[filename], source)]
+            if changed:
+                for filename in changed:
+                    onError(filename, ValueError(MERGE_CHANGED))
+            else:
+                inventory.markMerged([sources[filename] for filename in merged], source)
+                if args.aggregate:
+                    storefront.createOrderBatch(orders, source)
+                else:
+                    storefront.createOrder(orders, source)
+                for filename in merged:
+                    storefront.completeSource(sources[filename])
+                storefront.completeSource(source)
+        except Exception as e:
+            onError("merged orders", e)
+    else:
+        for filename in pending:
+            if unfinishedMerge(inventory, sources[filename]):
+                onError(filename, ValueError(MERGE_CHANGED))
+                continue
+            print(f"processing {filename}")
+            try:
+                if args.chunk_size:
+                    storefront.createOrderStreaming(filename, args.chunk_size, sources[filename], processor,
+                                                    args.aggregate)
+                else:
+                    with storefront.metrics.stage("parse"):
+                        orders = processor.processOrder(filename, sources[filename])
+                    if args.aggregate:
+                        storefront.createOrderBatch(orders, sources[filename])
+                    else:
+                        storefront.createOrder(orders, sources[filename])
+                storefront.completeSource(sources[filename])
+            except Exception as e:
+                onError(filename, e)
+
+    if not failed:
+        # everything applied, so fold the write-ahead log into a fresh snapshot
+        inventory.checkpoint()
+    inventory.close()
+    storefront.printDailyTransactions(args.output)
+    return EXIT_FAILED if failed else EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
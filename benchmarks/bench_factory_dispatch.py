@@ -0,0 +1,45 @@
+"""
+Micro-benchmark for per order line factory dispatch in Storefront.createOrder.
+
+Run from the repository root:
+    python -m benchmarks.bench_factory_dispatch
+"""
+import timeit
+
+from SupplyChain import Holiday, HolidayMapper
+
+HOLIDAY_NAMES = ["Christmas", "Easter", "Halloween", "halloween", "EASTER"]
+
+
+def dispatch_before():
+    """
+    the original dispatch: numpy upper, an if-chain and a new mapper and factory per line.
+    """
+    from numpy import char
+
+    for name in HOLIDAY_NAMES:
+        holiday = char.upper(name)
+        holiday_map = None
+        if holiday == "HALLOWEEN":
+            holiday_map = Holiday.HALLOWEEN
+        if holiday == "CHRISTMAS":
+            holiday_map = Holiday.CHRISTMAS
+        if holiday == "EASTER":
+            holiday_map = Holiday.EASTER
+        HolidayMapper.holiday_mapper.get(holiday_map)()
+
+
+def dispatch_after(mapper=HolidayMapper()):
+    for name in HOLIDAY_NAMES:
+        mapper.get_factory(mapper.get_holiday(name))
+
+
+def main(number=20000):
+    lines = number * len(HOLIDAY_NAMES)
+    for label, func in (("before", dispatch_before), ("after", dispatch_after)):
+        elapsed = timeit.timeit(func, number=number)
+        print(f"{label:<8} {elapsed / lines * 1e9:10.1f} ns per order line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Load test for the order intake service on localhost: hundreds of concurrent small order
+posts mixed with stock checks, reporting throughput and any requests refused by backpressure.
+
+Run from the repository root:
+    python -m benchmarks.bench_intake
+"""
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from intake_service import OrderIntakeService
+from SupplyChain import ConcurrentInventory, Storefront, TextTransactionReport
+
+ORDER = {"holiday": "Halloween", "item": "Toy", "name": "Tiny Tarantula", "product_id": "H0983T",
+         "description": "bench", "has_batteries": "Y", "min_age": 5, "speed": 4.0, "jump_height": 1.0,
+         "has_glow": "Y", "spider_type": "Tarantula"}
+
+
+async def request(port, method, target, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                 + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    await reader.read()
+    writer.close()
+    return status
+
+
+async def run(posts, orders_per_post, checks):
+    with tempfile.TemporaryDirectory() as directory:
+        report = TextTransactionReport(os.path.join(directory, "report.txt"))
+        service = OrderIntakeService(Storefront([], ConcurrentInventory([], [], []), report), maxQueue=50, putTimeout=5.0)
+        await service.start()
+        start = time.perf_counter()
+        tasks = [request(service.port, "POST", "/orders",
+                         [dict(ORDER, order_number=p * orders_per_post + i, quantity=1)
+                          for i in range(orders_per_post)])
+                 for p in range(posts)]
+        tasks += [request(service.port, "GET", "/inventory?product_id=H0983T") for _ in range(checks)]
+        statuses = await asyncio.gather(*tasks)
+        await service.stop()
+        elapsed = time.perf_counter() - start
+        report.close()
+
+    return statuses, elapsed, service.applied
+
+
+def main(posts=500, orders_per_post=3, checks=500):
+    # Storefront.createOrder prints every order; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        statuses, elapsed, applied = asyncio.run(run(posts, orders_per_post, checks))
+    accepted = statuses[:posts].count(202)
+    print(f"{posts} posts x {orders_per_post} orders + {checks} stock checks in {elapsed * 1000:.0f} ms")
+    print(f"accepted {accepted}, refused {statuses[:posts].count(503)}, applied {applied} orders, "
+          f"{(posts + checks) / elapsed:.0f} requests/s")
+    assert applied == accepted * orders_per_post
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmarks bulk stock deduction in Inventory against the old per-unit list removal.
+
+Run from the repository root:
+    python -m benchmarks.bench_inventory
+"""
+import time
+
+from SupplyChain import CandyCanes, Inventory, RCSpider, SqliteInventory
+
+
+def legacy_remove(inventory_list, item, quantity):
+    """
+    the original list based removal, kept here as the baseline.
+    """
+    i = int(quantity)
+    for toy in inventory_list:
+        if i == 0:
+            return
+        if item.name == toy.name:
+            i -= 1
+            inventory_list.remove(toy)
+
+
+def make_products(n):
+    return [RCSpider(f"Spider {i}", "bench", f"H{i:05d}T", True, 9, 10, 2, "Y", "Tarantula") for i in range(n)]
+
+
+def check_large_quantities():
+    """
+    a large order must deduct exactly the quantity requested, never more than what is on hand.
+    """
+    spider = make_products(1)[0]
+    inventory = Inventory([], [], [])
+    inventory.addToys(spider, 1_000_000)
+    assert inventory.deduct(spider.product_id, 999_999) == 999_999
+    assert inventory.countItemsToys(spider.name) == 1
+    assert inventory.deduct(spider.product_id, 10) == 1
+    assert inventory.countItemsToys(spider.name) == 0
+
+    candy = CandyCanes("Candy Canes - Red", "bench", "C7777C", "N", "N", "Red")
+    inventory.addToys(spider, 500)
+    inventory.addCandy(candy, 500)
+    removed = inventory.deductMany([(spider.product_id, 200), (candy.product_id, 100), (spider.product_id, 250)])
+    assert removed == {spider.product_id: 450, candy.product_id: 100}
+    assert inventory.countItemsToys(spider.name) == 50
+    assert inventory.countItemsCandy(candy.name) == 400
+
+    # a negative deduction would add stock, so it is refused and nothing in its batch is applied
+    for backend in (inventory, SqliteInventory(":memory:")):
+        backend.addToys(spider, 10)
+        before = backend.checkInventory(spider.product_id).count
+        for deduct in (lambda: backend.deduct(spider.product_id, -5),
+                       lambda: backend.deduct("unstocked", -5),
+                       lambda: backend.deductMany([(spider.product_id, 5), (spider.product_id, -100)])):
+            try:
+                deduct()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("a negative deduction was accepted")
+        assert backend.checkInventory(spider.product_id).count == before
+        assert backend.deduct(spider.product_id, 10 ** 12) == before
+        assert backend.checkInventory(spider.product_id).count == 0
+
+
+def check_renamed_product():
+    """
+    restocking a product_id under a new name counts the units under the name the product
+    was first stocked as, the same as SqliteInventory, so name counts never go negative.
+    """
+    first = RCSpider("Spider A", "bench", "H1T", True, 9, 10, 2, "Y", "Tarantula")
+    renamed = RCSpider("Spider B", "bench", "H1T", True, 9, 10, 2, "Y", "Tarantula")
+    for backend in (Inventory([], [], []), SqliteInventory(":memory:")):
+        backend.addToys(first, 10)
+        backend.addToys(renamed, 10)
+        backend.removeToy(first, 15)
+        assert backend.countItemsToys("Spider A") == 5
+        assert backend.countItemsToys("Spider B") == 0
+        assert backend.checkInventory("H1T").count == 5
+
+
+def check_remove_by_name():
+    """
+    remove* take units by name from every product countItems* counts, oldest stocked first,
+    as the original per-unit lists did, so checking by name and then removing agrees.
+    """
+    first, second, other = make_products(3)
+    twin = RCSpider(first.name, "bench", "H99999T", True, 9, 10, 2, "Y", "Tarantula")
+    for backend in (Inventory([], [], []), SqliteInventory(":memory:")):
+        backend.addToys(first, 3)
+        backend.addToys(twin, 10)
+        backend.addToys(other, 4)
+        assert backend.countItemsToys(first.name) == 13
+        backend.removeToy(twin, 8)
+        assert backend.countItemsToys(first.name) == 5
+        assert backend.checkInventory(first.product_id).count == 0
+        assert backend.checkInventory(twin.product_id).count == 5
+        backend.removeToy(first, 100)
+        assert backend.countItemsToys(first.name) == 0
+        assert backend.checkInventory(other.product_id).count == 4
+        backend.removeToy(second, 1)
+
+
+def bench(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.2f} ms")
+
+
+def main(skus=200, units=100, orders=2000, quantity=5):
+    products = make_products(skus)
+
+    def run_legacy():
+        stock = [product for product in products for _ in range(units)]
+        for i in range(orders):
+            legacy_remove(stock, products[i % skus], quantity)
+
+    def run_ledger():
+        inventory = Inventory([], [], [])
+        for product in products:
+            inventory.addToys(product, units)
+        for i in range(orders):
+            inventory.deduct(products[i % skus].product_id, quantity)
+
+    def run_batch():
+        inventory = Inventory([], [], [])
+        for product in products:
+            inventory.addToys(product, units)
+        inventory.deductMany((products[i % skus].product_id, quantity) for i in range(orders))
+
+    check_large_quantities()
+    check_renamed_product()
+    check_remove_by_name()
+    print(f"{skus} SKUs x {units} units, {orders} deductions of {quantity}")
+    bench("legacy list removal", run_legacy)
+    bench("ledger deduct", run_ledger)
+    bench("ledger deductMany", run_batch)
+
+
+if __name__ == "__main__":
+    main()
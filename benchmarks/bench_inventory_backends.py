@@ -0,0 +1,61 @@
+"""
+Compares the in-memory ledger Inventory with SqliteInventory at 10k, 100k and 1M stocked units.
+
+Each run stocks the units across SKUs of 100 units each, then applies one order line per
+10 units the way Storefront.createOrder does (checkInventory by product_id, then deduct),
+inside a single transaction, and finally a bulk deductMany of the same lines.
+
+Run from the repository root:
+    python -m benchmarks.bench_inventory_backends
+"""
+import os
+import tempfile
+import time
+
+from SupplyChain import Inventory, RCSpider, SqliteInventory
+
+UNITS_PER_SKU = 100
+
+
+def make_products(skus):
+    return [RCSpider(f"Spider {i}", "bench", f"H{i:06d}T", "Y", 9, 10.0, 2.0, "Y", "Tarantula") for i in range(skus)]
+
+
+def run(inventory, units):
+    products = make_products(units // UNITS_PER_SKU)
+    lines = [products[i % len(products)] for i in range(units // 10)]
+    timings = {}
+
+    start = time.perf_counter()
+    with inventory.transaction():
+        for product in products:
+            inventory.addToys(product, UNITS_PER_SKU)
+    timings["add"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with inventory.transaction():
+        for product in lines:
+            if inventory.checkInventory(product.product_id).count > 1:
+                inventory.deduct(product.product_id, 1)
+    timings["check+deduct"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    inventory.deductMany((product.product_id, 1) for product in lines)
+    timings["deductMany"] = time.perf_counter() - start
+    return timings
+
+
+def main(sizes=(10_000, 100_000, 1_000_000)):
+    print(f"{'units':>10} {'backend':<8} {'add':>10} {'check+deduct':>14} {'deductMany':>12}")
+    for units in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite_inventory = SqliteInventory(os.path.join(directory, "inventory.db"))
+            for label, inventory in (("memory", Inventory([], [], [])), ("sqlite", sqlite_inventory)):
+                timings = run(inventory, units)
+                print(f"{units:>10} {label:<8} {timings['add'] * 1000:>8.1f}ms {timings['check+deduct'] * 1000:>12.1f}ms "
+                      f"{timings['deductMany'] * 1000:>10.1f}ms")
+            sqlite_inventory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures memory per buffered order for the slotted Order with typed detail records
+against the previous __dict__ Order holding a full product_details dict of every
+detail column, most of them None.
+
+Run from the repository root:
+    python -m benchmarks.bench_orders --rows 100000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.generate_orders import generate_columns
+from SupplyChain import PRODUCT_DETAIL_COLUMNS, OrderProcessor
+
+
+class DictOrder:
+    """
+    the previous order representation, kept as the baseline.
+    """
+
+    def __init__(self, factoryMapping, orderNumber, productId, itemName, quantity, description, productDetails):
+        self.factoryMapping = factoryMapping
+        self.orderNumber = orderNumber
+        self.productId = productId
+        self.itemName = itemName
+        self.quantity = quantity
+        self.description = description
+        self.productDetails = productDetails
+
+
+def dict_orders(columns):
+    rows = zip(columns['order_number'], columns['holiday'], columns['item'], columns['name'], columns['quantity'],
+               columns['product_id'], columns['description'], zip(*[columns[c] for c in PRODUCT_DETAIL_COLUMNS]))
+    return [DictOrder((holiday, item), order_number, product_id, name, quantity, description,
+                      dict(zip(PRODUCT_DETAIL_COLUMNS, details)))
+            for order_number, holiday, item, name, quantity, product_id, description, details in rows]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    orders = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return orders, after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory held by buffered orders.")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    columns = generate_columns(args.rows)
+    frame = pd.DataFrame(columns)
+
+    # the baseline reuses the generated cell values while the compact orders also hold the values
+    # parsed out of the frame, so the saving shown is a lower bound
+    dict_built, dict_bytes = measure(lambda: dict_orders(columns))
+    del dict_built
+    compact, compact_bytes = measure(lambda: OrderProcessor().ordersFromFrame(frame))
+
+    print(f"{'orders':<26} {'total MiB':>10} {'bytes/order':>12}")
+    for label, total in (("__dict__ + 17-key dict", dict_bytes), ("slotted + typed details", compact_bytes)):
+        print(f"{label:<26} {total / 2 ** 20:>10.1f} {total / args.rows:>12.1f}")
+    print(f"{1 - compact_bytes / dict_bytes:.0%} less memory per order")
+    assert compact_bytes < dict_bytes, "compact orders use more memory than the dict baseline"
+
+
+if __name__ == "__main__":
+    main()
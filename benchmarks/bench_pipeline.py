@@ -0,0 +1,196 @@
+"""
+Benchmark suite for the order processing pipeline.
+
+For each size a synthetic export is generated and every stage is timed on its own:
+parsing (OrderProcessor.processOrder), factory dispatch (HolidayMapper and the factory
+create_* methods), inventory count/remove/add as Storefront.createOrder does it, the
+same dispatch and inventory work planned as one batch by OrderPlanner (checked to leave
+identical stock), and report writing. Each size runs in a fresh interpreter so the process
+peak RSS is per size; it is the high-water mark of the whole run so far, not of one stage.
+With --memory each size is run a second time under tracemalloc to measure the peak memory
+each stage allocates on its own, kept out of the timed run since tracing slows it down.
+Results are printed as rows/sec and memory and saved as JSON to compare across commits.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --sizes 1000 100000 1000000 --json bench.json
+    python -m benchmarks.bench_pipeline --sizes 100000 --memory
+    python -m benchmarks.bench_pipeline --baseline bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("parse", "dispatch", "inventory", "planned", "report")
+
+MIB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """
+    :return: peak resident set size of this process so far, in MiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+def run_stages(rows, file_format, trace=False):
+    """
+    runs every stage once for a size in this process.
+    :param trace: a bool, measure each stage's peak allocation with tracemalloc
+    :return: dict of stage name to its result
+    """
+    from benchmarks.generate_orders import write_orders
+    from SupplyChain import HolidayMapper, Inventory, OrderPlanner, OrderProcessor, Product, TextTransactionReport
+
+    results = {}
+
+    @contextlib.contextmanager
+    def stage(name):
+        if trace:
+            tracemalloc.reset_peak()
+            allocated = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        results[name] = {"seconds": round(elapsed, 4), "rows_per_sec": round(rows / elapsed) if elapsed else None,
+                         "process_peak_rss_mb": round(peak_rss_mb(), 1)}
+        if trace:
+            results[name]["stage_peak_mb"] = round((tracemalloc.get_traced_memory()[1] - allocated) / MIB, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, f"orders.{file_format}")
+        write_orders(rows, filename)
+        if trace:
+            tracemalloc.start()
+
+        with stage("parse"):
+            orders = OrderProcessor().processOrder(filename)
+
+        with stage("dispatch"):
+            mapper = HolidayMapper()
+            products = []
+            for order in orders:
+                products.append(mapper.build_product(order))
+
+        with stage("inventory"):
+            inventory = Inventory([], [], [])
+            add_operations = {
+                Product.TOY: inventory.addToys,
+                Product.STUFFED_ANIMAL: inventory.addStuffedAnimals,
+                Product.CANDY: inventory.addCandy
+            }
+            for order, (product, item) in zip(orders, products):
+                if inventory.checkInventory(item.product_id).count > order.getQuantity():
+                    inventory.deduct(item.product_id, order.getQuantity())
+                else:
+                    add_operations[product](item, 100)
+
+        with stage("planned"):
+            planned = Inventory([], [], [])
+            OrderPlanner(planned).plan(orders).apply(planned)
+        assert {pid: r.count for pid, r in planned.index.items()} == \
+               {pid: r.count for pid, r in inventory.index.items()}, "planned stock differs from sequential"
+
+        with stage("report"):
+            report = TextTransactionReport(os.path.join(directory, "dailyTransactions.txt"))
+            for order in orders:
+                report.write(order)
+            report.close()
+        if trace:
+            tracemalloc.stop()
+    return results
+
+
+def run_child(rows, file_format, trace=False):
+    command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", str(rows), "--format", file_format]
+    if trace:
+        command.append("--memory")
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_size(rows, file_format, memory=False):
+    """
+    runs one size in a fresh interpreter, and again under tracemalloc if memory is asked for.
+    :return: dict of stage name to its result
+    """
+    stages = run_child(rows, file_format)
+    if memory:
+        for name, result in run_child(rows, file_format, trace=True).items():
+            stages[name]["stage_peak_mb"] = result["stage_peak_mb"]
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_runs = {(run["rows"], run["format"]): run for run in (baseline or {}).get("runs", [])}
+    print(f"{'rows':>9} {'format':<8} {'stage':<10} {'rows/sec':>12} {'seconds':>9} {'stage peak':>11} "
+          f"{'process peak RSS':>17}")
+    for run in results["runs"]:
+        previous = baseline_runs.get((run["rows"], run["format"]))
+        for stage in STAGES:
+            result = run["stages"][stage]
+            stage_peak = f"{result['stage_peak_mb']:>9.1f}MB" if "stage_peak_mb" in result else f"{'-':>11}"
+            line = (f"{run['rows']:>9} {run['format']:<8} {stage:<10} {result['rows_per_sec'] or 0:>12,} "
+                    f"{result['seconds']:>9.3f} {stage_peak} {result['process_peak_rss_mb']:>15.1f}MB")
+            if previous and previous["stages"].get(stage, {}).get("seconds"):
+                line += f"   {result['seconds'] / previous['stages'][stage]['seconds']:5.2f}x baseline time"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the order processing pipeline stage by stage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--format", default="csv", choices=("csv", "xlsx", "parquet", "jsonl"),
+                        help="order file format to parse; xlsx is very slow to generate at 1M rows")
+    parser.add_argument("--json", default=None, help="save results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results from an earlier run to compare against")
+    parser.add_argument("--memory", action="store_true",
+                        help="run each size again under tracemalloc to measure each stage's own peak allocation")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(run_stages(args.child, args.format, args.memory)))
+        return 0
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [{"rows": rows, "format": args.format, "stages": run_size(rows, args.format, args.memory)}
+                 for rows in args.sizes]
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
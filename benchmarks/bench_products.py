@@ -0,0 +1,66 @@
+"""
+Measures memory per distinct SKU for the slotted product classes and checks that
+repeated orders for the same SKU reuse the pooled product instead of allocating.
+
+Run from the repository root:
+    python -m benchmarks.bench_products
+"""
+import tracemalloc
+
+from SupplyChain import Holiday, HolidayMapper, PRODUCT_POOL, Product
+
+
+def spider_fields(i):
+    return {'name': f"Spider {i}", 'description': "bench", 'product_id': f"H{i:06d}T", 'has_batteries': "Y",
+            'min_age': 9, 'speed': 10.0, 'jump_height': 2.0, 'has_glow': "Y", 'spider_type': "Tarantula"}
+
+
+class DictSpider:
+    """
+    an equivalent __dict__ based product, kept as the baseline.
+    """
+
+    def __init__(self, name, description, product_id, has_batteries, min_age, speed, jump_height, has_glow,
+                 spider_type):
+        self.name = name
+        self.description = description
+        self.product_id = product_id
+        self.has_batteries = has_batteries
+        self.min_age = min_age
+        self.speed = speed
+        self.jump_height = jump_height
+        self.has_glow = has_glow
+        self.spider_type = spider_type
+
+
+def measure(build, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = [build(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return products, (after - before) / len(rows)
+
+
+def main(skus=10000, repeats=10):
+    factory = HolidayMapper().get_factory(Holiday.HALLOWEEN)
+    rows = [spider_fields(i) for i in range(skus)]
+    PRODUCT_POOL.clear()
+
+    _, dict_bytes = measure(lambda row: DictSpider(**row), rows)
+    _, slot_bytes = measure(lambda row: factory.create_toys(**row), rows)
+    print(f"__dict__ product      {dict_bytes:8.1f} bytes per SKU (excluding field values)")
+    print(f"slotted + pooled      {slot_bytes:8.1f} bytes per SKU (excluding field values)")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(repeats):
+        products = factory.create_many(Product.TOY, rows)
+        del products
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{repeats * skus} repeat orders retained {after - before} bytes, pool holds {len(PRODUCT_POOL)} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Times saving and warm starting an inventory snapshot, with and without a write-ahead log to replay.
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshot
+"""
+import os
+import tempfile
+import time
+
+from SupplyChain import CandyCanes, Inventory, RCSpider
+
+
+def build_inventory(skus):
+    inventory = Inventory([], [], [])
+    for i in range(skus // 2):
+        inventory.addToys(RCSpider(f"Spider {i}", "bench", f"H{i:06d}T", "Y", 9, 10.0, 2.0, "Y", "Tarantula"), 100)
+        inventory.addCandy(CandyCanes(f"Candy Canes {i}", "bench", f"C{i:06d}C", "N", "N", "Red"), 100)
+    return inventory
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:10.2f} ms")
+    return result
+
+
+def main(skus=30000, logged_changes=10000):
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, "inventory.snapshot")
+        inventory = build_inventory(skus)
+        timed(f"save snapshot ({skus} SKUs)", lambda: inventory.saveSnapshot(snapshot))
+        print(f"{'snapshot size':<40} {os.path.getsize(snapshot) / 1024:10.1f} KiB")
+        timed("load snapshot", lambda: Inventory.loadSnapshot(snapshot))
+
+        inventory = Inventory.open(snapshot)
+        for i in range(logged_changes):
+            inventory.deduct(f"H{i % (skus // 2):06d}T", 1)
+        inventory.close()
+        recovered = timed(f"open + replay {logged_changes} log entries", lambda: Inventory.open(snapshot))
+        assert recovered.checkInventory("H000000T").count == 100 - len(range(0, logged_changes, skus // 2))
+        recovered.close()
+
+
+if __name__ == "__main__":
+    main()
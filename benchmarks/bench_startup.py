@@ -0,0 +1,64 @@
+"""
+Measures how long importing the application takes, using python -X importtime, and fails
+when startup exceeds a budget or pulls in a heavy dependency that should be imported lazily.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--budget-ms 150]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("SupplyChain", "driver", "batch_driver")
+
+# only the Excel/CSV/Parquet ingestion path may import these
+LAZY_DEPENDENCIES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+
+def import_times(module):
+    """
+    imports a module in a fresh interpreter with -X importtime.
+    :param module: a String
+    :return: dict of imported module name to cumulative microseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="fail if any module takes longer to import")
+    parser.add_argument("--runs", type=int, default=5, help="imports per module; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module in MODULES:
+        runs = [import_times(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda times: times[module])
+        total_ms = best[module] / 1000
+        heaviest = sorted(((us, name) for name, us in best.items() if name != module), reverse=True)[:3]
+        print(f"{module:<14} {total_ms:8.1f} ms   heaviest: "
+              + ", ".join(f"{name} {us / 1000:.1f}ms" for us, name in heaviest))
+        eager = [name for name in LAZY_DEPENDENCIES if name in best]
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} at startup")
+        if total_ms > args.budget_ms:
+            failures.append(f"{module} took {total_ms:.1f} ms to import, budget is {args.budget_ms} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Kill-and-resume check for batch_driver.
+
+Each scenario runs batch_driver on a synthetic export in a child process and kills it
+with SIGKILL once part of the transaction report is on disk, then runs it again to the
+end. The resumed run must leave a report with every order exactly once and the same stock
+as a clean run that was never interrupted. Scenarios cover both inventory backends, whole
+files, chunked files, batch planning, whole or per chunk, and two files merged with -j.
+A merged run is also resumed with one of its files dropped, which must be refused.
+
+Run from the repository root:
+    python -m benchmarks.crash_resume --rows 60000
+"""
+import argparse
+import collections
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate_orders import write_orders
+from SupplyChain import Inventory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "memory": ["--backend", "memory"],
+    "memory chunked": ["--backend", "memory", "--chunk-size", "5000"],
+    "memory aggregate": ["--backend", "memory", "--aggregate"],
+    "memory chunked aggregate": ["--backend", "memory", "--chunk-size", "5000", "--aggregate"],
+    "sqlite": ["--backend", "sqlite"],
+    "sqlite chunked": ["--backend", "sqlite", "--chunk-size", "5000"],
+    "sqlite aggregate": ["--backend", "sqlite", "--aggregate"],
+    "sqlite chunked aggregate": ["--backend", "sqlite", "--chunk-size", "5000", "--aggregate"],
+    "memory merged": ["--backend", "memory", "-j", "2"],
+    "sqlite merged": ["--backend", "sqlite", "-j", "2"]
+}
+
+ORDER_LINE = re.compile(r"Order (\d+),")
+
+
+def driver(orders, directory, options):
+    return [sys.executable, os.path.join(ROOT, "batch_driver.py"), *orders, "-i", os.path.join(directory, "inventory"),
+            "-o", os.path.join(directory, "report.txt")] + options
+
+
+def files(orders, options):
+    """
+    :return: the order files a scenario runs on, both files when they are merged with -j
+    """
+    return orders if "-j" in options else orders[:1]
+
+
+def reported(directory):
+    """
+    :return: a Counter of order number to the times the order appears in the report
+    """
+    try:
+        with open(os.path.join(directory, "report.txt")) as f:
+            return collections.Counter(int(match.group(1)) for match in map(ORDER_LINE.match, f) if match)
+    except FileNotFoundError:
+        return collections.Counter()
+
+
+def stock(directory, options):
+    """
+    :return: dict of product_id to units on hand after a run
+    """
+    filename = os.path.join(directory, "inventory")
+    if "sqlite" in options:
+        with sqlite3.connect(filename) as connection:
+            return dict(connection.execute("SELECT product_id, count FROM stock"))
+    inventory = Inventory.open(filename)
+    counts = {product_id: record.count for product_id, record in inventory.index.items()}
+    inventory.close()
+    return counts
+
+
+def killed(orders, directory, options, after):
+    """
+    starts a run and kills it once the report holds at least after orders.
+    :return: the number of orders in the report when the run was killed
+    """
+    process = subprocess.Popen(driver(orders, directory, options), cwd=directory, stdout=subprocess.DEVNULL)
+    while process.poll() is None:
+        count = sum(reported(directory).values())
+        if count >= after:
+            process.send_signal(signal.SIGKILL)
+            process.wait()
+            return count
+        time.sleep(0.01)
+    raise AssertionError("run finished before it could be killed, raise --rows")
+
+
+def check_changed_merge(orders, directory, rows, kill_at):
+    """
+    kills a run merging two files with -j, then resumes it with only the first file. That
+    file's progress was recorded for the merged stream, so the run must refuse it rather than
+    apply its orders again; resuming with both files must then finish as usual.
+    """
+    options = ["--backend", "memory", "-j", "2"]
+    killed(orders, directory, options, int(rows * 2 * kill_at))
+    refused = subprocess.run(driver(orders[:1], directory, options), cwd=directory, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+    assert refused.returncode == 1 and "same files" in refused.stderr, refused.stderr
+    subprocess.run(driver(orders, directory, options), cwd=directory, stdout=subprocess.DEVNULL, check=True)
+    counts = reported(directory)
+    assert len(counts) == rows and set(counts.values()) == {2}, "resumed merge reported orders twice or not at all"
+    print("merged run resumed with a file dropped: refused")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kill batch_driver part way through and check the resumed run.")
+    parser.add_argument("--rows", type=int, default=60000)
+    parser.add_argument("--kill-at", type=float, default=0.4, help="fraction of the orders reported before the kill")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        orders = [os.path.join(directory, "orders.csv"), os.path.join(directory, "more-orders.csv")]
+        write_orders(args.rows, orders[0])
+        write_orders(args.rows, orders[1], seed=1722)
+        print(f"{'scenario':<26} {'killed at':>10} {'report lines':>13} {'duplicates':>11} {'missing':>8} {'stock':>6}")
+        failures = []
+        for name, options in SCENARIOS.items():
+            clean = os.path.join(directory, name.replace(" ", "-") + "-clean")
+            os.mkdir(clean)
+            subprocess.run(driver(files(orders, options), clean, options), cwd=clean, stdout=subprocess.DEVNULL,
+                           check=True)
+
+            crashed = os.path.join(directory, name.replace(" ", "-") + "-crashed")
+            os.mkdir(crashed)
+            # each order number appears once per file, as every export numbers its orders from 1
+            copies = len(files(orders, options))
+            at = killed(files(orders, options), crashed, options, int(args.rows * copies * args.kill_at))
+            subprocess.run(driver(files(orders, options), crashed, options), cwd=crashed, stdout=subprocess.DEVNULL,
+                           check=True)
+
+            counts = reported(crashed)
+            duplicates = sum(count - copies for count in counts.values() if count > copies)
+            missing = args.rows - len(counts)
+            same_stock = stock(crashed, options) == stock(clean, options)
+            print(f"{name:<26} {at:>10,} {sum(counts.values()):>13,} {duplicates:>11,} {missing:>8,} "
+                  f"{'same' if same_stock else 'DIFF':>6}")
+            if duplicates or missing or not same_stock:
+                failures.append(name)
+        changed = os.path.join(directory, "changed-merge")
+        os.mkdir(changed)
+        check_changed_merge(orders, changed, args.rows, args.kill_at)
+    assert not failures, f"resumed runs differ from a clean run: {', '.join(failures)}"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
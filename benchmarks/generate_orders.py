@@ -0,0 +1,115 @@
+"""
+Synthetic order export generator producing a realistic mix across every Holiday x Product.
+
+A fixed catalogue of SKUs is built per holiday and product, and orders pick SKUs with a
+skewed popularity so a few hot SKUs take most of the volume, as on a real peak day.
+
+Run from the repository root:
+    python -m benchmarks.generate_orders 100000 orders-100k.csv
+"""
+import argparse
+import random
+
+from SupplyChain import ORDER_COLUMNS, PRODUCT_DETAIL_COLUMNS, OrderSourceMapper
+
+SKUS_PER_PRODUCT = 25
+
+STUFFINGS = ("Polyester Fibrefill", "Wool")
+SIZES = ("S", "M", "L")
+FABRICS = ("Linen", "Cotton", "Acrylic")
+
+
+def _details(holiday, item, rng):
+    """
+    the product detail columns a SKU of this holiday and item type uses.
+    """
+    if item == "Toy":
+        details = {'min_age': rng.choice((1, 3, 5, 9))}
+        if holiday == "Christmas":
+            details.update(has_batteries="N", dimensions=f"{rng.randint(40, 140)},{rng.randint(60, 120)}",
+                           num_rooms=rng.randint(2, 9))
+        elif holiday == "Halloween":
+            details.update(has_batteries="Y", speed=rng.randint(2, 20), jump_height=rng.randint(1, 6),
+                           has_glow=rng.choice("YN"), spider_type=rng.choice(("Tarantula", "Wolf Spider")))
+        else:
+            details.update(has_batteries="Y", num_sound=rng.randint(5, 40),
+                           colour=rng.choice(("Orange", "Blue", "Pink")))
+    elif item == "StuffedAnimal":
+        details = {'stuffing': rng.choice(STUFFINGS), 'size': rng.choice(SIZES), 'fabric': rng.choice(FABRICS)}
+        if holiday == "Easter":
+            details['colour'] = rng.choice(("White", "Grey", "Pink", "Blue"))
+        else:
+            details['has_glow'] = rng.choice("YN")
+    else:
+        details = {'has_nuts': rng.choice("YN"), 'has_lactose': rng.choice("YN")}
+        if holiday == "Christmas":
+            details['colour'] = rng.choice(("Red", "Green"))
+        elif holiday == "Halloween":
+            details['variety'] = rng.choice(("Regular", "Sea Salt"))
+        else:
+            details['pack_size'] = rng.choice((6, 12, 50))
+    return details
+
+
+def catalogue(rng, skus_per_product=SKUS_PER_PRODUCT):
+    """
+    builds the SKUs orders are drawn from.
+    :return: a list of dicts of order sheet columns, without order_number and quantity
+    """
+    skus = []
+    for holiday in ("Christmas", "Halloween", "Easter"):
+        for item in ("Toy", "StuffedAnimal", "Candy"):
+            for n in range(skus_per_product):
+                sku = {'holiday': holiday, 'item': item, 'name': f"{holiday} {item} {n}",
+                       'product_id': f"{holiday[0]}{n:04d}{item[0]}", 'description': f"A {holiday} {item.lower()}"}
+                sku.update(_details(holiday, item, rng))
+                skus.append(sku)
+    return skus
+
+
+def generate_columns(rows, seed=3522):
+    """
+    generates an order export.
+    :param rows: an int, number of orders
+    :param seed: an int
+    :return: dict of column name to list of values
+    """
+    rng = random.Random(seed)
+    skus = catalogue(rng)
+    # skewed popularity: the i-th most popular SKU is ordered about 1/(i+1) as often as the first
+    weights = [1 / (rank + 1) for rank in range(len(skus))]
+    rng.shuffle(skus)
+    picks = rng.choices(skus, weights, k=rows)
+    columns = {column: [] for column in ORDER_COLUMNS + PRODUCT_DETAIL_COLUMNS}
+    for order_number, sku in enumerate(picks, 1):
+        for column, values in columns.items():
+            values.append(sku.get(column))
+        columns['order_number'][-1] = order_number
+        columns['quantity'][-1] = rng.randint(1, 20)
+    return columns
+
+
+def write_orders(rows, filename, seed=3522):
+    """
+    writes a synthetic order export in the format given by the file extension.
+    :param rows: an int
+    :param filename: a String
+    :param seed: an int
+    :return: None
+    """
+    import pandas as pd
+
+    OrderSourceMapper().get_source(filename).writeFrame(pd.DataFrame(generate_columns(rows, seed)), filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic order export.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("filename", help=".xlsx, .csv, .parquet or .jsonl")
+    parser.add_argument("--seed", type=int, default=3522)
+    args = parser.parse_args(argv)
+    write_orders(args.rows, args.filename, args.seed)
+
+
+if __name__ == "__main__":
+    main()
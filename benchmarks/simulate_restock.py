@@ -0,0 +1,107 @@
+"""
+Restock policy simulation: replays historical order files against an in-memory inventory
+under each restock policy and reports how often products were restocked, how many orders
+found too little stock and the peak number of units held.
+
+Policies are restock configuration files as read by batch_driver --restock-policy, e.g.
+    {"policy": "reorder_point", "orderCost": 50, "leadTime": {"default": 100, "holiday": {"Christmas": 300}}}
+Without --policy the built-in fixed, reorder_point and demand_rate policies are compared.
+
+Run from the repository root:
+    python -m benchmarks.simulate_restock 'exports/orders-*.csv'
+    python -m benchmarks.simulate_restock orders.xlsx --policy fixed.json eoq.json --json restock.json
+"""
+import argparse
+import json
+import os
+import sys
+
+from batch_driver import expandPatterns
+from SupplyChain import Inventory, OrderOutcome, OrderPlanner, OrderProcessor, RestockPolicyMapper
+
+BUILT_IN_POLICIES = {
+    "fixed": {"policy": "fixed"},
+    "reorder_point": {"policy": "reorder_point"},
+    "demand_rate": {"policy": "demand_rate"}
+}
+
+
+def simulate(days, policy, inventory):
+    """
+    replays each day's orders in turn, planning them as createOrderBatch does.
+    :param days: a list of lists of Orders, one per order file
+    :param policy: a RestockPolicy
+    :param inventory: an Inventory, changed in place
+    :return: dict of results
+    """
+    on_hand = sum(record.count for record in inventory.index.values())
+    results = {"orders": 0, "fulfilled": 0, "short": 0, "unknown": 0, "restocks": 0, "restocked_units": 0,
+               "peak_stock": on_hand}
+    restocked_products = set()
+    for orders in days:
+        plan = OrderPlanner(inventory, policy).plan(orders)
+        for order, stock_item, outcome, units in plan.outcomes:
+            results["orders"] += 1
+            if outcome == OrderOutcome.FULFILLED:
+                results["fulfilled"] += 1
+                on_hand -= int(order.getQuantity())
+            elif outcome == OrderOutcome.RESTOCKED:
+                results["short"] += 1
+            else:
+                results["unknown"] += 1
+            if units:
+                results["restocks"] += 1
+                results["restocked_units"] += units
+                restocked_products.add(stock_item.product_id)
+                on_hand += units
+                results["peak_stock"] = max(results["peak_stock"], on_hand)
+        plan.apply(inventory)
+    results["final_stock"] = on_hand
+    results["fill_rate"] = round(results["fulfilled"] / max(results["orders"] - results["unknown"], 1), 4)
+    results["restocks_per_product"] = round(results["restocks"] / max(len(restocked_products), 1), 1)
+    return results
+
+
+def print_results(results):
+    print(f"{'policy':<16} {'orders':>9} {'fill rate':>9} {'short':>7} {'restocks':>9} {'per SKU':>8} "
+          f"{'units in':>10} {'peak stock':>11} {'final':>9}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['orders']:>9,} {result['fill_rate']:>9.2%} {result['short']:>7,} "
+              f"{result['restocks']:>9,} {result['restocks_per_product']:>8} {result['restocked_units']:>10,} "
+              f"{result['peak_stock']:>11,} {result['final_stock']:>9,}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare restock policies by replaying historical order files.")
+    parser.add_argument("orders", nargs="+", help="order files or glob patterns, replayed in order")
+    parser.add_argument("--policy", nargs="+", default=None, help="restock configuration JSON files to compare")
+    parser.add_argument("-i", "--inventory", default=None, help="inventory snapshot to start from, empty if not given")
+    parser.add_argument("--json", default=None, help="save results to this JSON file")
+    args = parser.parse_args(argv)
+
+    filenames = expandPatterns(args.orders)
+    if not filenames:
+        print("no order files matched", file=sys.stderr)
+        return 2
+    days = [list(OrderProcessor().processOrder(filename)) for filename in filenames]
+
+    mapper = RestockPolicyMapper()
+    if args.policy:
+        policies = {os.path.splitext(os.path.basename(filename))[0]: mapper.load(filename)[0]
+                    for filename in args.policy}
+    else:
+        policies = {name: mapper.get_policy(config) for name, config in BUILT_IN_POLICIES.items()}
+
+    results = {}
+    for name, policy in policies.items():
+        inventory = Inventory.loadSnapshot(args.inventory) if args.inventory else Inventory([], [], [])
+        results[name] = simulate(days, policy, inventory)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"files": filenames, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
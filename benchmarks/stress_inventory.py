@@ -0,0 +1,224 @@
+"""
+Stress test and read benchmark for ConcurrentInventory.
+
+Writer threads apply random orders to one shared inventory the way Storefront.applyOrders
+does: check the count and then deduct or restock, inside atomic(). Now and then a writer
+also restocks or writes off stock outside atomic(), the way another terminal would.
+Each writer tallies the units it added and removed. When the writers finish, each
+product's count must equal its starting count plus the units added minus the units
+removed, no order may have found less stock than its check reported, and re-opening
+the write-ahead log must give the same counts.
+
+Reader threads call checkInventory in a loop while the writers run. Their throughput
+and latency are compared against two baselines: an idle inventory, and a single lock
+around the whole inventory that writers hold for a batch of orders at a time. The plain
+Inventory is run under the same load for reference, with its lost units reported.
+
+Run from the repository root:
+    python -m benchmarks.stress_inventory --writers 4 --readers 2 --seconds 3
+"""
+import argparse
+import array
+import collections
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.generate_orders import catalogue
+from SupplyChain import RESTOCK_QUANTITY, ConcurrentInventory, HolidayMapper, Inventory
+
+INITIAL_STOCK = 100
+
+
+class SingleLockInventory(Inventory):
+    """
+    the coarse baseline: one lock guards every read and write, and a transaction holds it
+    for the whole batch, as a createOrder batch would.
+    """
+
+    def __init__(self, toyInventory, stuffedAnimalInventory, candyInventory):
+        self.lock = threading.RLock()
+        super().__init__(toyInventory, stuffedAnimalInventory, candyInventory)
+
+    def addTo(self, ledger, item, quantity):
+        with self.lock:
+            super().addTo(ledger, item, quantity)
+
+    def deductFrom(self, ledger, product_id, quantity):
+        with self.lock:
+            return super().deductFrom(ledger, product_id, quantity)
+
+    def checkInventory(self, product_id):
+        with self.lock:
+            return super().checkInventory(product_id)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.lock:
+            yield self
+
+    def atomic(self):
+        return self.transaction()
+
+
+def stock_items(skus_per_product):
+    """
+    :return: a list of (ProductEnum, product) for the synthetic catalogue
+    """
+    mapper = HolidayMapper()
+    items = []
+    for sku in catalogue(random.Random(3522), skus_per_product):
+        product = mapper.get_product(sku['item'])
+        spec = mapper.get_factory(mapper.get_holiday(sku['holiday'])).get_spec(product)
+        items.append((product, spec.create(sku)))
+    return items
+
+
+def writer(inventory, items, seconds, batch, seed, results):
+    rng = random.Random(seed)
+    added, removed = collections.Counter(), collections.Counter()
+    orders = short = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        with inventory.transaction():
+            for _ in range(batch):
+                product, item = rng.choice(items)
+                product_id, quantity = item.product_id, rng.randint(1, 20)
+                with inventory.atomic():
+                    on_hand = inventory.checkInventory(product_id).count
+                    if on_hand > quantity:
+                        deducted = inventory.deduct(product_id, quantity)
+                        removed[product_id] += deducted
+                        short += deducted != quantity
+                    else:
+                        inventory.addTo(inventory.ledgers[product], item, RESTOCK_QUANTITY)
+                        added[product_id] += RESTOCK_QUANTITY
+                orders += 1
+                if rng.random() < 0.1:
+                    product, item = rng.choice(items)
+                    if rng.random() < 0.5:
+                        inventory.addTo(inventory.ledgers[product], item, 10)
+                        added[item.product_id] += 10
+                    else:
+                        removed[item.product_id] += inventory.deduct(item.product_id, 5)
+    results.append((added, removed, orders, short))
+
+
+def reader(inventory, product_ids, stop, seed, latencies):
+    rng = random.Random(seed)
+    check = inventory.checkInventory
+    clock = time.perf_counter
+    while not stop.is_set():
+        product_id = rng.choice(product_ids)
+        start = clock()
+        check(product_id)
+        latencies.append(clock() - start)
+
+
+def run(inventory, items, args, writers):
+    """
+    runs the readers, and the writers if asked, against one inventory.
+    :return: dict of results
+    """
+    product_ids = [item.product_id for _, item in items]
+    stop = threading.Event()
+    latencies = [array.array('d') for _ in range(args.readers)]
+    readers = [threading.Thread(target=reader, args=(inventory, product_ids, stop, seed, latencies[seed]))
+               for seed in range(args.readers)]
+    results = []
+    writer_threads = [threading.Thread(target=writer, args=(inventory, items, args.seconds, args.batch, seed, results))
+                      for seed in range(writers)]
+    start = time.perf_counter()
+    for thread in readers + writer_threads:
+        thread.start()
+    if writer_threads:
+        for thread in writer_threads:
+            thread.join()
+    else:
+        time.sleep(args.seconds)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    added, removed = collections.Counter(), collections.Counter()
+    orders = short = 0
+    for writer_added, writer_removed, writer_orders, writer_short in results:
+        added.update(writer_added)
+        removed.update(writer_removed)
+        orders += writer_orders
+        short += writer_short
+    lost = sum(abs(inventory.index[product_id].count - (INITIAL_STOCK + added[product_id] - removed[product_id]))
+               for product_id in product_ids)
+    samples = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+    return {
+        "reads_per_sec": len(samples) / elapsed,
+        "p99_us": samples[int(len(samples) * 0.99)] * 1e6 if samples else 0,
+        "p99_9_us": samples[int(len(samples) * 0.999)] * 1e6 if samples else 0,
+        "orders_per_sec": orders / elapsed,
+        "short": short,
+        "lost": lost
+    }
+
+
+def stocked(inventory, items):
+    for product, item in items:
+        inventory.addTo(inventory.ledgers[product], item, INITIAL_STOCK)
+    return inventory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress ConcurrentInventory and measure reads during writes.")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--batch", type=int, default=500,
+                        help="orders per createOrder batch; the single lock baseline holds its lock for each batch")
+    parser.add_argument("--skus", type=int, default=5, help="SKUs per holiday and product")
+    args = parser.parse_args(argv)
+
+    # switch threads often so unsynchronized read-modify-writes are actually interleaved
+    sys.setswitchinterval(1e-5)
+    items = stock_items(args.skus)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, "inventory.snapshot")
+        results["idle"] = run(stocked(ConcurrentInventory([], [], []), items), items, args, 0)
+        results["concurrent"] = run(stocked(ConcurrentInventory([], [], []), items), items, args, args.writers)
+
+        concurrent = stocked(ConcurrentInventory.open(snapshot), items)
+        results["concurrent + log"] = run(concurrent, items, args, args.writers)
+        counts = {product_id: record.count for product_id, record in concurrent.index.items()}
+        for ledger in concurrent.ledgers.values():
+            names = collections.Counter()
+            for record in ledger:
+                names[record.product.name] += record.count
+            assert all(ledger.countName(name) == count for name, count in names.items()), "name counts drifted"
+        concurrent.close()
+        recovered = ConcurrentInventory.open(snapshot)
+        assert {product_id: record.count for product_id, record in recovered.index.items()} == counts, \
+            "write-ahead log replay differs from the inventory"
+        recovered.close()
+
+        results["single lock"] = run(stocked(SingleLockInventory([], [], []), items), items, args, args.writers)
+        results["unsynchronized"] = run(stocked(Inventory([], [], []), items), items, args, args.writers)
+
+    print(f"{len(items)} SKUs, {args.writers} writers, {args.readers} readers, {args.seconds:g}s each")
+    print(f"{'inventory':<16} {'reads/sec':>11} {'p99 read':>10} {'p99.9 read':>11} "
+          f"{'orders/sec':>11} {'short':>6} {'lost units':>11}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['reads_per_sec']:>11,.0f} {result['p99_us']:>8.1f}us {result['p99_9_us']:>9.1f}us "
+              f"{result['orders_per_sec']:>11,.0f} {result['short']:>6} "
+              f"{result['lost']:>11}")
+    for name in ("concurrent", "concurrent + log"):
+        assert results[name]["lost"] == 0, f"{name} inventory lost updates"
+        assert results[name]["short"] == 0, f"{name}: an order found less stock than its check reported"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+import sys
+
+from SupplyChain import OrderProcessor
+
+
+def main():
+    """
+    Converts an order export to another format, e.g.
+        python convert_orders.py orders.xlsx orders.parquet
+    """
+    if len(sys.argv) != 3:
+        print("usage: python convert_orders.py <source file> <target file>")
+        sys.exit(2)
+    OrderProcessor().convertOrders(sys.argv[1], sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 # Student number: A01051088
 # Name: Benjamin Lui
 # Student number: A01242661
-from SupplyChain import Inventory, Storefront
+from SupplyChain import Inventory, Storefront, TextTransactionReport
 
 
 def main():
@@ -11,7 +11,7 @@ def main():
     inventory3 = []
     inventory = Inventory(inventory1, inventory2, inventory3)
     orders = []
-    store = Storefront(orders, inventory)
+    store = Storefront(orders, inventory, TextTransactionReport('dailyTransactions.txt', append=False))
     store.userMenu()
 
 
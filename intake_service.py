@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from SupplyChain import ORDER_SCHEMA, ConcurrentInventory, Order, ReportMapper, Storefront
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    """
+    raised while handling a request to send an error response.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OrderIntakeService:
+    """
+    Local HTTP intake service in front of a Storefront.
+
+    POST /orders accepts a JSON array (or JSON Lines) of order records using the order sheet
+    columns. Batches are validated, queued on a bounded queue and drained into
+    Storefront.createOrder by a single writer, so stock changes are applied one batch at a
+    time. When the queue stays full the request is refused with 503 so clients back off.
+
+    GET /inventory?product_id=...&product_id=... answers stock checks straight from the
+    inventory on the event loop, concurrently with the writer.
+    """
+
+    def __init__(self, storefront, maxQueue=100, putTimeout=1.0):
+        """
+        initializer for the intake service.
+        :param storefront: a Storefront
+        :param maxQueue: an int, number of batches that may wait for the writer
+        :param putTimeout: a float, seconds a request waits for queue space before a 503
+        """
+        self.storefront = storefront
+        self.queue = asyncio.Queue(maxQueue)
+        self.putTimeout = putTimeout
+        self.batchIds = itertools.count(1)
+        # the storefront is only ever touched by this one thread, keeping stock changes serial
+        self.writerExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-writer")
+        self.writerTask = None
+        self.server = None
+        self.applied = 0
+        self.failed = 0
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """
+        starts listening on a TCP port, or on a Unix socket if path is given.
+        :param host: a String
+        :param port: an int, 0 picks a free port
+        :param path: a String, Unix socket path
+        :return: None
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        self.writerTask = asyncio.create_task(self.writer())
+
+    @property
+    def port(self):
+        """
+        :return: the TCP port the service is listening on
+        """
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        stops accepting requests, applies every queued batch and stops the writer.
+        :return: None
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        await self.queue.join()
+        self.writerTask.cancel()
+        try:
+            await self.writerTask
+        except asyncio.CancelledError:
+            pass
+        self.writerExecutor.shutdown()
+
+    async def writer(self):
+        """
+        the single writer: applies queued batches to the storefront one at a time.
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch_id, orders = await self.queue.get()
+            try:
+                await loop.run_in_executor(self.writerExecutor, self.storefront.createOrder, orders)
+                self.applied += len(orders)
+            except Exception as e:
+                self.failed += len(orders)
+                print(f"failed to apply batch {batch_id}: {e}", file=sys.stderr)
+            finally:
+                self.queue.task_done()
+
+    async def handle(self, reader, writer):
+        """
+        handles one HTTP request per connection.
+        :param reader: an asyncio StreamReader
+        :param writer: an asyncio StreamWriter
+        :return: None
+        """
+        try:
+            try:
+                method, target, body = await self.readRequest(reader)
+                status, payload = await self.route(method, target, body)
+            except HttpError as e:
+                status, payload = e.status, {"error": str(e)}
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            await self.sendResponse(writer, status, payload)
+        finally:
+            writer.close()
+
+    async def readRequest(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line") from None
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    raise HttpError(400, "bad Content-Length") from None
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, body
+
+    async def sendResponse(self, writer, status, payload, headers=()):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/orders":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            return await self.postOrders(body)
+        if url.path == "/inventory":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            product_ids = parse_qs(url.query).get("product_id", [])
+            checks = self.storefront.inventory.checkMany(product_ids)
+            return 200, {product_id: {"count": check.count,
+                                      "category": check.category.name if check.category else None,
+                                      "status": check.status.name}
+                         for product_id, check in checks.items()}
+        if url.path == "/health":
+            return 200, {"queued": self.queue.qsize(), "applied": self.applied, "failed": self.failed}
+        raise HttpError(404, f"no route for {url.path}")
+
+    async def postOrders(self, body):
+        orders = [self.validate(record) for record in self.parseRecords(body)]
+        if not orders:
+            raise HttpError(400, "no orders in request")
+        batch_id = next(self.batchIds)
+        try:
+            await asyncio.wait_for(self.queue.put((batch_id, orders)), self.putTimeout)
+        except asyncio.TimeoutError:
+            raise HttpError(503, "order queue is full, retry later") from None
+        return 202, {"batch": batch_id, "queued": len(orders)}
+
+    def parseRecords(self, body):
+        try:
+            text = body.decode("utf-8").strip()
+            if text.startswith("["):
+                return json.loads(text)
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        except UnicodeDecodeError as e:
+            raise HttpError(400, f"request body is not UTF-8: {e}") from None
+        except ValueError as e:
+            raise HttpError(400, f"invalid JSON: {e}") from None
+
+    def validate(self, record):
+        """
+        turns a record into an Order, checking it against the order sheet schema, so a bad
+        record is refused here rather than failing in the writer.
+        :param record: a dict
+        :return: an Order
+        """
+        if not isinstance(record, dict):
+            raise HttpError(400, "each order must be a JSON object")
+        reasons = ORDER_SCHEMA.checkRecord(record)
+        if reasons:
+            raise HttpError(400, f"invalid order {record.get('order_number')}: {'; '.join(reasons)}")
+        try:
+            return Order.fromRecord(record)
+        except (KeyError, TypeError, ValueError) as e:
+            raise HttpError(400, f"invalid order {record.get('order_number')}: {e}") from None
+
+
+async def serve(args):
+    # the writer thread applies orders while stock checks read the inventory on the event loop
+    inventory = ConcurrentInventory.open(args.inventory)
+    storefront = Storefront([], inventory, ReportMapper().get_report(args.output))
+    service = OrderIntakeService(storefront, args.max_queue)
+    await service.start(args.host, args.port, args.unix_socket)
+    print(f"accepting orders on {args.unix_socket or f'http://{args.host}:{service.port}'}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+        inventory.checkpoint()
+        inventory.close()
+        storefront.printDailyTransactions()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accept web order batches over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", default=None, help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-i", "--inventory", default="inventory.snapshot")
+    parser.add_argument("-o", "--output", default="dailyTransactions.txt")
+    parser.add_argument("--max-queue", type=int, default=100, help="batches that may wait for the writer")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()